@@ -1,16 +1,35 @@
+import itertools
+import json
 import os
 import re
-import time
 import uuid
+import zipfile
+from collections import deque
+from contextlib import closing, contextmanager
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, as_completed, wait
 
-from input_handler import get_user_input, parse_file_only
-from llm_agent import query_llama
-from doc_writer import generate_docx
-from pdf_writer import generate_pdf
-from ppt_writer import generate_ppt
-from text_chunker import chunk_text
+from input_handler import get_user_input, iter_file_text, file_cache_key
+from llm_agent import query_llama, GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE
+from prompts import DOCUMENT_PROMPT, MAP_PROMPT, NOTES_REQUEST, REDUCE_PROMPT, prompt_profile
+from rate_limiter import RateLimiter
+from markdown_stream import iter_sections
+from metrics import in_context, span, timed_iter
+from pools import get_process_pool
+from artifact_store import output_store
+from text_chunker import chunk_text, cached_chunk_text, count_tokens
 
 
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "4"))
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "700"))  # cautious chunk size
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+
+# Map-reduce budgets (tokens); llama3-70b-8192 has an 8k context window
+MAP_NOTES_TOKENS = int(os.getenv("MAP_NOTES_TOKENS", "300"))
+REDUCE_NOTES_TOKENS = int(os.getenv("REDUCE_NOTES_TOKENS", "600"))
+REDUCE_INPUT_TOKENS = int(os.getenv("REDUCE_INPUT_TOKENS", "3000"))
+GENERATION_MODES = ('chunked', 'mapreduce')
+OUTPUT_FORMATS = ('docx', 'pdf', 'pptx')
+
 # === Output Format Prompt ===
 
 def get_output_format():
@@ -30,31 +49,10 @@ def get_output_format():
 
 # === Filename Sanitizer ===
 
-def sanitize_filename(text, extension):
+def slugify_title(text):
     base = re.sub(r'[^\w\s-]', '', text).strip().lower()
     base = re.sub(r'[\s\-]+', '_', base)
-    filename = base[:] if base else str(uuid.uuid4())[:8]
-    return f"outputs/{filename}.{extension}"
-
-# === Overwrite Prompt or Autoversion ===
-
-def confirm_or_version(path):
-    if not os.path.exists(path):
-        return path
-    while True:
-        choice = input(f"\n⚠️ File '{path}' exists. Overwrite? (y/n): ").strip().lower()
-        if choice == "y":
-            return path
-        elif choice == "n":
-            base, ext = os.path.splitext(path)
-            i = 2
-            while os.path.exists(f"{base}({i}){ext}"):
-                i += 1
-            new_path = f"{base}({i}){ext}"
-            print(f"📁 Creating new file: {new_path}")
-            return new_path
-        else:
-            print("Please enter 'y' or 'n'")
+    return base[:] if base else str(uuid.uuid4())[:8]
 
 # === Title & Body Extractor ===
 
@@ -82,6 +80,194 @@ def extract_title_and_body(response):
             return line.strip(), "\n".join(lines[1:]).strip()
     return "Untitled Document", response.strip()
 
+def split_title(sections):
+    """
+    Streaming counterpart of extract_title_and_body: consumes markdown sections
+    until the first '# ' heading and returns (title, iterator over the rest).
+    Sections before the title are kept; without any '# ' heading the whole
+    stream is drained and the fallback rules above apply.
+    """
+    sections = iter(sections)
+    seen = []
+    for section in sections:
+        first, _, rest = section.partition("\n")
+        if first.startswith("# "):
+            title = re.sub(r'^#\s+', '', first).strip()
+            rest = [rest] if rest.strip() else []
+            return title, itertools.chain(seen, rest, sections)
+        seen.append(section)
+    title, body = extract_title_and_body("\n\n".join(seen))
+    return title, iter([body])
+
+def salvage_slide_deck(text):
+    """
+    The complete slides of a JSON deck cut off mid-way (e.g. at max_tokens):
+    the longest prefix, the whole text or one ending in '}', that parses once
+    the slides list and the deck are closed. None if no prefix does.
+    """
+    end = len(text)
+    while end > 0:
+        try:
+            deck = json.loads(text[:end] + ']}')
+        except ValueError:
+            deck = None
+        if isinstance(deck, dict) and isinstance(deck.get('slides'), list):
+            return deck
+        end = text.rfind('}', 0, end - 1) + 1
+    return None
+
+def extract_slide_deck(responses):
+    """
+    Merges the JSON slide decks answered for every chunk (see
+    prompts.SLIDES_JSON_PROMPT) into (title, slides); the first title names
+    the deck. A truncated deck keeps its complete slides. A reply that is not
+    JSON at all is kept as a markdown string, which ppt_writer splits into
+    slides by its headings, but only if it has '## ' slide headings; anything
+    else is dropped, and with nothing left the deck has no slides, which
+    generate_ppt_deck refuses.
+    """
+    title, slides = None, []
+    for response in responses:
+        is_json = response.lstrip().startswith('{')
+        try:
+            deck = json.loads(response)
+        except ValueError:
+            deck = salvage_slide_deck(response) if is_json else None
+        if is_json and not isinstance(deck, dict):
+            continue   # nothing usable; never let raw JSON become a title
+        if not isinstance(deck, dict) or not isinstance(deck.get('slides'), list):
+            response_title, body = extract_title_and_body(response)
+            if re.search(r'^##\s', body, re.MULTILINE):
+                title = title or response_title
+                slides.append(body)
+            continue
+        title = title or str(deck.get('title') or '').strip() or None
+        slides.extend(slide for slide in deck['slides'] if isinstance(slide, dict))
+    return title or "Untitled Document", slides
+
+# === Concurrent Chunk Dispatcher ===
+
+def request_limiter(requests_per_minute=None, tokens_per_minute=None):
+    """A limiter for an explicit per-request budget, or None to share llm_agent's process-wide one."""
+    if requests_per_minute or tokens_per_minute:
+        return RateLimiter(requests_per_minute or GROQ_REQUESTS_PER_MINUTE,
+                           tokens_per_minute or GROQ_TOKENS_PER_MINUTE)
+    return None
+
+def dispatch_chunks(chunks, max_workers=None, requests_per_minute=None, tokens_per_minute=None,
+                    use_cache=True, on_chunk_done=None, template=DOCUMENT_PROMPT, max_tokens=None):
+    """
+    Sends chunks to the LLM in parallel and returns the responses in chunk order.
+    Pacing is done by a token-bucket limiter; without an explicit budget the
+    process-wide limiter in llm_agent is shared with every other request.
+    on_chunk_done(n) is called with the number of chunks finished so far.
+    """
+    limiter = request_limiter(requests_per_minute, tokens_per_minute)
+    workers = max(1, min(max_workers or LLM_MAX_WORKERS, len(chunks)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(in_context(query_llama), chunk, limiter=limiter, use_cache=use_cache,
+                               template=template, max_tokens=max_tokens)
+                   for chunk in chunks]
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if on_chunk_done:
+                on_chunk_done(done)
+        return [future.result() for future in futures]
+    finally:
+        # Fail fast: a GroqAPIError on one chunk cancels the chunks still queued
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def stream_chunk_responses(chunks, max_workers=None, use_cache=True, on_chunk_done=None,
+                           template=DOCUMENT_PROMPT, max_tokens=None, requests_per_minute=None,
+                           tokens_per_minute=None):
+    """
+    Yields response text in chunk order. The first chunk is streamed token by
+    token so rendering can start immediately; later chunks are prefetched
+    concurrently, with at most `max_workers` responses held in memory.
+    Rate limits are applied as in dispatch_chunks.
+    """
+    if not chunks:
+        return
+    rest = iter(chunks[1:])
+    workers = max(1, max_workers or LLM_MAX_WORKERS)
+    request = dict(limiter=request_limiter(requests_per_minute, tokens_per_minute), use_cache=use_cache,
+                   template=template, max_tokens=max_tokens)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = deque(pool.submit(in_context(query_llama), chunk, **request)
+                        for chunk in itertools.islice(rest, workers))
+        yield from query_llama(chunks[0], stream=True, **request)
+        done = 1
+        if on_chunk_done:
+            on_chunk_done(done)
+        while pending:
+            text = pending.popleft().result()
+            for chunk in itertools.islice(rest, 1):
+                pending.append(pool.submit(in_context(query_llama), chunk, **request))
+            done += 1
+            if on_chunk_done:
+                on_chunk_done(done)
+            yield "\n\n"
+            yield text
+    finally:
+        # As in dispatch_chunks: an LLM error, or the consumer giving up (the
+        # writer failed and closed this generator), cancels the queued chunks
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# === Map-Reduce Summarization ===
+
+def pack_batches(notes, budget):
+    """Groups consecutive notes into batches whose token total fits `budget`, at least two per batch."""
+    batches = []
+    current, size = [], 0
+    for note in notes:
+        tokens = count_tokens(note)
+        if len(current) >= 2 and size + tokens > budget:
+            batches.append(current)
+            current, size = [], 0
+        current.append(note)
+        size += tokens
+    if len(current) == 1 and batches:
+        batches[-1].append(current[0])
+    elif current:
+        batches.append(current)
+    return batches
+
+def map_reduce_notes(prompt, chunks, max_workers=None, requests_per_minute=None,
+                     tokens_per_minute=None, use_cache=True, report=None):
+    """
+    Condenses a source too large for one request, already split into chunks,
+    into a single set of notes.
+    Map: every chunk is turned into short notes in parallel.
+    Reduce: consecutive notes are merged in batches that fit the context
+    window, level by level, until one set remains. Each level shrinks the
+    notes several-fold, so depth grows with log(chunks).
+    Returns None when the source fits in a single chunk.
+    """
+    if len(chunks) <= 1:
+        return None
+    report = report or (lambda stage, done=0, total=0: None)
+    dispatch = dict(max_workers=max_workers, requests_per_minute=requests_per_minute,
+                    tokens_per_minute=tokens_per_minute, use_cache=use_cache)
+
+    total = len(chunks)
+    report('mapping', 0, total)
+    requests = [MAP_PROMPT.format(task=prompt, index=i, total=total, excerpt=chunk)
+                for i, chunk in enumerate(chunks, 1)]
+    with span('map', items=total):
+        notes = dispatch_chunks(requests, template=MAP_PROMPT, max_tokens=MAP_NOTES_TOKENS,
+                                on_chunk_done=lambda done: report('mapping', done, total), **dispatch)
+
+    while len(notes) > 1:
+        batches = pack_batches(notes, REDUCE_INPUT_TOKENS)
+        report('reducing', 0, len(batches))
+        requests = [REDUCE_PROMPT.format(task=prompt, notes="\n\n---\n\n".join(batch)) for batch in batches]
+        with span('reduce', items=len(batches)):
+            notes = dispatch_chunks(requests, template=REDUCE_PROMPT, max_tokens=REDUCE_NOTES_TOKENS,
+                                    on_chunk_done=lambda done: report('reducing', done, len(batches)), **dispatch)
+    return notes[0]
+
 # === CLI Entry Point ===
 
 def run_agent_pipeline():
@@ -95,63 +281,243 @@ def run_agent_pipeline():
         final_prompt = f"{user_input['prompt']}\n\nHere is the file content:\n{user_input['content']}"
 
     print("\n🧠 Generating response...")
-    response = query_llama(final_prompt)
-    title, body = extract_title_and_body(response)
-
-    os.makedirs("outputs", exist_ok=True)
-    output_path = sanitize_filename(title, output_format)
-    output_path = confirm_or_version(output_path)
+    profile = prompt_profile(output_format)
+    response = query_llama(final_prompt, template=profile.template, max_tokens=profile.budget(1))
+    if profile.template.json:
+        title, body = extract_slide_deck([response])
+    else:
+        title, body = extract_title_and_body(response)
 
+    title = title.strip()
     print("\n📄 Generating document...")
-    if output_format == "docx":
-        generate_docx(body=body, output_path=output_path, title=title.strip())
-    elif output_format == "pdf":
-        generate_pdf(body=body, output_path=output_path, title=title.strip())
-    elif output_format == "pptx":
-        generate_ppt(content=body, output_path=output_path, filename_title=title.strip())
-    else:
-        raise ValueError("Unsupported output format.")
+    # Stored like API outputs: a fresh versioned name in its shard, listed and served by the app
+    with reserved_output(title, output_format) as output_path:
+        # Writers pull in python-docx / reportlab / python-pptx, so load them on first use
+        if output_format == "docx":
+            from doc_writer import generate_docx
+            generate_docx(body=body, output_path=output_path, title=title)
+        elif output_format == "pdf":
+            from pdf_writer import generate_pdf
+            generate_pdf(body=body, output_path=output_path, title=title)
+        elif output_format == "pptx" and profile.template.json:
+            from ppt_writer import generate_ppt_deck
+            generate_ppt_deck(body, output_path=output_path, filename_title=title)
+        elif output_format == "pptx":
+            from ppt_writer import generate_ppt
+            generate_ppt(content=body, output_path=output_path, filename_title=title)
+        else:
+            raise ValueError("Unsupported output format.")
+    output_store.record(output_path, title, output_format)
 
     print(f"\n✅ Document saved to: {output_path}")
     print("✅ Document generation complete!")
 
 # === API Entry Point ===
 
-def run_agent_from_api(prompt, file_path=None, output_format='docx'):
-    if file_path:
-        ext = os.path.splitext(file_path)[1]
-        file_content = parse_file_only(file_path, ext)
-        full_prompt = f"{prompt}\n\n{file_content}"
-    else:
-        full_prompt = prompt
+def next_output_path(title, output_format):
+    """Reserves a fresh path in outputs/ (see OutputStore.allocate)."""
+    return output_store.allocate(slugify_title(title), output_format)
 
-    # Chunk large input to respect token limits
-    chunks = chunk_text(full_prompt, max_tokens=700)  # cautious chunk size
-    combined_response = ""
-    for chunk in chunks:
-        response = query_llama(chunk)
-        combined_response += response + "\n\n"
-        time.sleep(2)  # delay to avoid rate limit
+@contextmanager
+def reserved_output(title, output_format):
+    """Yields a fresh output path; if rendering fails, the placeholder and its reservation are released."""
+    path = next_output_path(title, output_format)
+    try:
+        yield path
+    except BaseException:
+        output_store.discard(path)
+        raise
 
-    title, body = extract_title_and_body(combined_response)
-
-    os.makedirs('outputs', exist_ok=True)
-
-    output_path = sanitize_filename(title, output_format)
-    if os.path.exists(output_path):
-        base, ext = os.path.splitext(output_path)
-        i = 2
-        while os.path.exists(f"{base}({i}){ext}"):
-            i += 1
-        output_path = f"{base}({i}){ext}"
+# === Multi-Format Rendering ===
 
+def render_document(output_format, body, output_path, title):
     if output_format == 'docx':
+        from doc_writer import generate_docx
         generate_docx(body, output_path, title)
     elif output_format == 'pdf':
+        from pdf_writer import generate_pdf
         generate_pdf(body, output_path, title)
     elif output_format == 'pptx':
-        generate_ppt(body, output_path, title)
+        from ppt_writer import generate_ppt
+        generate_ppt(body, output_path, filename_title=title)
     else:
         raise ValueError("Unsupported format.")
+    return output_path
+
+def render_formats(formats, body, title):
+    """
+    Renders the same title/body into every requested format concurrently.
+    The writers are CPU-bound, so each one runs in a worker of the shared
+    process pool (see pools) and the
+    total time is close to that of the slowest writer. The markdown is parsed
+    once here and the IR is shipped to every writer.
+    """
+    from markdown_ir import parse_markdown
+    nodes = parse_markdown(body)
+    paths = [next_output_path(title, fmt) for fmt in formats]
+    pool = get_process_pool()
+    futures = [pool.submit(render_document, fmt, nodes, path, title) for fmt, path in zip(formats, paths)]
+    done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+    if any(future.exception() for future in done):
+        # Let the other writers stop before their files are released
+        for future in pending:
+            future.cancel()
+        wait(pending)
+        for path in paths:
+            output_store.discard(path)
+    return [future.result() for future in futures]
+
+def bundle_outputs(paths, title):
+    with reserved_output(title, 'zip') as zip_path:
+        with zipfile.ZipFile(zip_path, 'w') as bundle:
+            for path in paths:
+                # docx/pptx are zip archives already; recompressing them gains nothing
+                stored = path.endswith(('.docx', '.pptx'))
+                bundle.write(path, arcname=os.path.basename(path),
+                             compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+    return zip_path
+
+def run_agent_from_api(prompt, file_path=None, output_format='docx', max_workers=None,
+                       requests_per_minute=None, tokens_per_minute=None, stream=False, use_cache=True,
+                       progress=None, mode='chunked', file_hash=None, job_id=None):
+    """
+    With stream=True the LLM output is parsed into sections while it is being
+    generated and each writer renders sections as soon as they are complete,
+    instead of waiting for the full combined response.
+    LLM responses are cached, so regenerating the same prompt and file in
+    another format costs no API calls; use_cache=False forces fresh answers.
+    progress(stage, chunks_done, chunks_total), if given, is called as the
+    pipeline moves through parsing, generating and rendering.
+    output_format may also be a list of formats: the LLM output is generated
+    and split into title/body once, every format is rendered in parallel and
+    the path of a zip bundle holding all of them is returned.
+    mode='mapreduce' first condenses a large file into notes (see
+    map_reduce_notes) and then makes a single generation request from them,
+    so the document is written in one voice instead of stitched from chunks.
+    file_hash, the content hash of an uploaded file, keys the extracted text
+    and chunk caches; a repeat upload of the same bytes skips parsing.
+    The instructions and completion budget follow the output format (see
+    prompts.prompt_profile) and, for the budget, whether a single request
+    writes the whole document; a pptx-only request asks for JSON slides, which
+    are rendered without re-parsing markdown.
+    Every file written is added to the outputs index under job_id.
+    Stages are timed as metrics spans (parse, chunk, map/reduce, generate,
+    llm.*, title, render.<format>) and land in the caller's trace, if any.
+    """
+    formats = [output_format] if isinstance(output_format, str) else list(dict.fromkeys(output_format))
+    if not formats or any(fmt not in OUTPUT_FORMATS for fmt in formats):
+        raise ValueError("Unsupported format.")
+    if stream and len(formats) > 1:
+        raise ValueError("Streaming renders a single format.")
+    if mode not in GENERATION_MODES:
+        raise ValueError("Unsupported mode.")
+    if len(formats) == 1:
+        output_format = formats[0]
+    profile = prompt_profile(output_format, stream)
+
+    def report(stage, done=0, total=0):
+        if progress:
+            progress(stage, done, total)
+
+    report('parsing')
+    # Chunk large input to respect token limits. Files are read as a stream
+    # (PDFs page by page) and chunked as they arrive; chunk lists are cached
+    # per file content, so a repeat upload is not read at all.
+    # Chunking time includes reading the file ('parse' is the reading alone)
+    chunking = dict(max_tokens=CHUNK_MAX_TOKENS, overlap=CHUNK_OVERLAP_TOKENS)
+    if not file_path:
+        with span('chunk'):
+            chunks = chunk_text(prompt, **chunking)
+    else:
+        ext = os.path.splitext(file_path)[1]
+        file_key = file_hash or file_cache_key(file_path)
+
+        def read_file():
+            return timed_iter('parse', iter_file_text(file_path, ext, file_key), bytes_in=os.path.getsize(file_path))
+
+        if mode == 'mapreduce':
+            with span('chunk'):
+                excerpts = cached_chunk_text(file_key, read_file, **chunking)
+            notes = map_reduce_notes(prompt, excerpts, max_workers, requests_per_minute,
+                                     tokens_per_minute, use_cache, report)
+            if notes is not None:
+                chunks = [NOTES_REQUEST.format(task=prompt, notes=notes)]
+            else:
+                with span('chunk'):
+                    chunks = chunk_text(itertools.chain((prompt, "\n\n"), excerpts), **chunking)
+        else:
+            with span('chunk'):
+                chunks = cached_chunk_text([file_key, prompt],
+                                           lambda: itertools.chain((prompt, "\n\n"), read_file()), **chunking)
+    total = len(chunks)
+    # A single request writes the whole document, so it gets the whole-document budget
+    generation = dict(template=profile.template, max_tokens=profile.budget(total))
+    report('generating', 0, total)
+
+    def chunk_done(done):
+        report('generating', done, total)
+
+    if stream:
+        def stream_chunk_done(done):
+            # Once every chunk is in, what remains is the writer finishing the document
+            report('rendering' if done == total else 'generating', done, total)
+
+        fragments = stream_chunk_responses(chunks, max_workers, use_cache, stream_chunk_done, **generation,
+                                           requests_per_minute=requests_per_minute,
+                                           tokens_per_minute=tokens_per_minute)
+        # Generation and rendering overlap here, so both count as the render stage;
+        # closing the fragments right away if rendering fails stops generation too
+        with closing(fragments), span(f'render.{output_format}', items=total) as render_span:
+            title, sections = split_title(iter_sections(fragments))
+            with reserved_output(title, output_format) as output_path:
+                if output_format == 'docx':
+                    from doc_writer import generate_docx_stream
+                    generate_docx_stream(sections, output_path, title)
+                elif output_format == 'pdf':
+                    from pdf_writer import generate_pdf_stream
+                    generate_pdf_stream(sections, output_path, title)
+                else:
+                    from ppt_writer import generate_ppt_stream
+                    generate_ppt_stream(sections, output_path, filename_title=title)
+            render_span.add(bytes_out=os.path.getsize(output_path))
+        return output_store.record(output_path, title, output_format, job_id)
+
+    with span('generate', items=total):
+        responses = dispatch_chunks(chunks, max_workers, requests_per_minute, tokens_per_minute, use_cache,
+                                    chunk_done, **generation)
+
+    if profile.template.json:
+        with span('title', chars_in=sum(map(len, responses))):
+            title, slides = extract_slide_deck(responses)
+        report('rendering', total, total)
+        with span('render.pptx') as render_span:
+            from ppt_writer import generate_ppt_deck
+            with reserved_output(title, 'pptx') as output_path:
+                generate_ppt_deck(slides, output_path, filename_title=title)
+            render_span.add(bytes_out=os.path.getsize(output_path))
+        return output_store.record(output_path, title, 'pptx', job_id)
+
+    combined_response = "\n\n".join(responses)
+
+    with span('title', chars_in=len(combined_response)):
+        title, body = extract_title_and_body(combined_response)
+    report('rendering', total, total)
 
-    return output_path
\ No newline at end of file
+    if len(formats) > 1:
+        with span('render.bundle', items=len(formats)) as render_span:
+            paths = render_formats(formats, body, title)
+            try:
+                zip_path = bundle_outputs(paths, title)
+            except BaseException:
+                for path in paths:
+                    output_store.discard(path)
+                raise
+            render_span.add(bytes_out=os.path.getsize(zip_path))
+        for fmt, path in zip(formats, paths):
+            output_store.record(path, title, fmt, job_id)
+        return output_store.record(zip_path, title, 'zip', job_id)
+    with span(f'render.{output_format}') as render_span:
+        with reserved_output(title, output_format) as output_path:
+            render_document(output_format, body, output_path, title)
+        render_span.add(bytes_out=os.path.getsize(output_path))
+    return output_store.record(output_path, title, output_format, job_id)
\ No newline at end of file
@@ -1,22 +1,66 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, send_file, jsonify, abort
+import hashlib
 import os
 from werkzeug.utils import secure_filename
-from agent_orchestrator import run_agent_from_api
+from agent_orchestrator import run_agent_from_api, OUTPUT_FORMATS, GENERATION_MODES
+from job_queue import JobQueue
+from upload_store import UploadRequest, store_upload
+from artifact_store import output_store, uploaded_files, OUTPUT_DIR, UPLOAD_DIR
+from metrics import render_metrics
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'  # Replace with a secure key
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
-OUTPUT_FOLDER = os.path.join(os.path.dirname(__file__), 'outputs')
+# Upload parts are streamed to disk and hashed while the request is parsed
+app.request_class = UploadRequest
+UPLOAD_FOLDER = UPLOAD_DIR
+OUTPUT_FOLDER = OUTPUT_DIR
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'csv'}
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# === Background Generation Jobs ===
+
+def run_generation_job(job_id, params, progress):
+    return run_agent_from_api(params['prompt'], params['file_path'],
+                              output_format=params['output_format'], progress=progress,
+                              mode=params.get('mode', 'chunked'), file_hash=params.get('file_hash'),
+                              job_id=job_id)
+
+job_queue = JobQueue(run_generation_job)
+
+# Workers start in the process that serves requests, never on import: pool
+# workers, benchmarks and the debug reloader's parent import this module too
+@app.before_request
+def start_job_workers():
+    job_queue.start()
+
+def wants_json():
+    return request.accept_mimetypes.best == 'application/json'
+
+def job_status(job):
+    status = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'chunks_done': job['chunks_done'],
+        'chunks_total': job['chunks_total'],
+        'error': job['error'],
+        'download_url': None,
+        # Per-stage timing breakdown, once the job has finished or failed
+        'timings': job['timings'],
+    }
+    if job['status'] == 'done':
+        status['download_url'] = url_for('download_job', job_id=job['id'])
+    return status
+
 @app.route('/', methods=['GET'])
 def home():
     chat_history = []
@@ -25,40 +69,105 @@ def home():
 @app.route('/generate', methods=['POST'])
 def generate():
     prompt = request.form.get('prompt', '')
-    doc_type = request.form.get('doc_type', 'docx')
+    # Several doc_type values (or 'all') render every format from one LLM pass
+    doc_types = request.form.getlist('doc_type') or ['docx']
+    if 'all' in doc_types:
+        doc_types = list(OUTPUT_FORMATS)
+    doc_type = doc_types[0] if len(doc_types) == 1 else doc_types
+    # 'mapreduce' condenses large uploads into notes before writing
+    mode = request.form.get('mode', 'chunked')
+    if mode not in GENERATION_MODES:
+        mode = 'chunked'
     file = request.files.get('document')
     filename = None
     file_path = None
+    file_hash = None
 
-    # Handle file upload
+    # Handle file upload: stored by content hash, so identical uploads are
+    # kept once and never overwrite a different file with the same name
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        ext = os.path.splitext(filename)[1]
+        file_hash, file_path = store_upload(file, uploaded_files, ext)
         flash(f'File "{filename}" uploaded successfully.', 'success')
     elif file and file.filename != '':
         flash('Invalid file type. Allowed: txt, pdf, csv.', 'danger')
         file_path = None
 
-    # Call your agent pipeline (API entry point)
-    try:
-        output_path = run_agent_from_api(prompt, file_path, output_format=doc_type)
-        output_filename = os.path.basename(output_path)
-        download_url = url_for('download', filename=output_filename)
-        generated_content = f"Document generated successfully as <b>{output_filename}</b>."
-    except Exception as e:
-        generated_content = f"❌ Error generating document: {e}"
-        download_url = None
+    # Queue the agent pipeline and answer right away; a worker does the rest
+    job_id = job_queue.submit(prompt=prompt, file_path=file_path, file_hash=file_hash,
+                              output_format=doc_type, mode=mode)
+    status_url = url_for('get_job', job_id=job_id)
+    if wants_json():
+        return jsonify({'job_id': job_id, 'status_url': status_url}), 202
 
+    generated_content = (f"Your document is being generated (job <b>{job_id}</b>). "
+                         f"Track progress at <a href=\"{status_url}\">{status_url}</a>.")
     chat_history = []
     return render_template('layout.html',
                            chat_history=chat_history,
                            generated_content=generated_content,
-                           download_url=download_url)
+                           download_url=None), 202
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    message = f"Upload too large. The limit is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."
+    if wants_json():
+        return jsonify({'error': message}), 413
+    flash(message, 'danger')
+    return redirect(url_for('home'))
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job_status(job))
+
+@app.route('/jobs/<job_id>/download')
+def download_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        abort(404)
+    if job['status'] != 'done':
+        return jsonify(job_status(job)), 409
+    return send_output(os.path.basename(job['output_path']))
+
+# Downloads and listings come from the outputs index, not the directory tree.
+# Conditional responses give clients ETag revalidation and resumable Range requests.
+def send_output(filename):
+    output = output_store.get(filename)
+    if output is None:
+        abort(404)
+    output_store.touch(filename)
+    # Indexed outputs never change, so name, size and creation time identify the bytes
+    etag = hashlib.sha1(f"{filename}:{output['size']}:{output['created']}".encode('utf-8')).hexdigest()
+    try:
+        return send_file(output_store.file_path(filename), as_attachment=True, conditional=True,
+                         etag=etag, last_modified=output['created'])
+    except FileNotFoundError:
+        abort(404)
+
+@app.route('/outputs')
+def list_outputs():
+    outputs = output_store.list(job_id=request.args.get('job_id'),
+                                limit=request.args.get('limit', 100, type=int))
+    for output in outputs:
+        output['download_url'] = url_for('download', filename=output['name'])
+    return jsonify(outputs)
 
 @app.route('/download/<filename>')
 def download(filename):
-    return send_from_directory(app.config['OUTPUT_FOLDER'], filename, as_attachment=True)
+    return send_output(filename)
+
+# Stage latency histograms and counters of this process, Prometheus text format
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
+    # Under the reloader only the child (WERKZEUG_RUN_MAIN) serves; start it
+    # right away so jobs queued before a restart resume without a request
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_queue.start()
     app.run(debug=True, port = 5001)
@@ -0,0 +1,229 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(ROOT_DIR, 'outputs')
+UPLOAD_DIR = os.path.join(ROOT_DIR, 'uploads')
+CACHE_DIR = os.path.join(ROOT_DIR, 'cache')
+
+DAY = 24 * 60 * 60
+OUTPUT_RETENTION_DAYS = float(os.getenv("OUTPUT_RETENTION_DAYS", "7"))
+OUTPUT_MAX_BYTES = int(os.getenv("OUTPUT_MAX_BYTES", str(2 * 1024 ** 3)))
+UPLOAD_RETENTION_DAYS = float(os.getenv("UPLOAD_RETENTION_DAYS", "2"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(2 * 1024 ** 3)))
+# Text extracted from uploads and its chunk lists; by default kept no longer than the uploads
+CACHE_RETENTION_DAYS = float(os.getenv("CACHE_RETENTION_DAYS", str(UPLOAD_RETENTION_DAYS)))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(1024 ** 3)))
+SWEEP_INTERVAL = 60.0       # seconds between opportunistic retention sweeps
+RESERVATION_TTL = 60 * 60   # reserved names never recorded (failed renders) are freed after this
+
+
+def shard_of(name):
+    """Two hex digits spread files over 256 subdirectories."""
+    return hashlib.sha1(name.encode('utf-8')).hexdigest()[:2]
+
+
+def atomic_write(path, data):
+    """
+    Writes `data` (str as UTF-8, or bytes) to `path` through a temp file in
+    the same directory, renamed into place: readers never see a partial
+    file, and concurrent writers (threads or processes) never share one.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.write-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data.encode('utf-8') if isinstance(data, str) else data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+# === Artifact Store ===
+
+class ArtifactStore:
+    """
+    Files kept in sharded subdirectories of `directory`, with a SQLite index
+    of every stored file (title, format, size, created and last access time,
+    job id). Downloads and listings are answered from the index instead of
+    the directory tree.
+
+    Retention: files not accessed for `max_age` seconds are deleted, then the
+    least recently accessed ones until the total is within `max_bytes`. Sweeps run
+    at most every SWEEP_INTERVAL seconds, piggybacking on record().
+
+    allocate() keeps the familiar 'title.docx', 'title(2).docx', ... scheme,
+    but the next number comes from a per-name counter and the file is
+    reserved with O_CREAT | O_EXCL: one round trip instead of an exists()
+    probe per previous version, and two requests never share a file.
+    """
+
+    def __init__(self, directory, max_age, max_bytes, path=None):
+        self.directory = directory
+        self.path = path or os.path.join(directory, '.artifacts.sqlite3')
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.last_sweep = 0.0
+        self.sweep_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS name_counters (name TEXT PRIMARY KEY, next INTEGER NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS reservations (name TEXT PRIMARY KEY, created REAL NOT NULL)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                " name TEXT PRIMARY KEY, title TEXT NOT NULL, format TEXT NOT NULL,"
+                " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL, job_id TEXT)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS artifacts_job ON artifacts(job_id)")
+            db.execute("CREATE INDEX IF NOT EXISTS artifacts_created ON artifacts(created)")
+            db.execute("CREATE INDEX IF NOT EXISTS artifacts_accessed ON artifacts(accessed)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def file_path(self, name):
+        return os.path.join(self.directory, shard_of(name), name)
+
+    def allocate(self, stem, extension):
+        """Reserves and returns a new, empty path for `stem`.`extension`."""
+        name = f"{stem}.{extension}"
+        with self._connect() as db:
+            while True:
+                n = db.execute("INSERT INTO name_counters (name, next) VALUES (?, 1) "
+                               "ON CONFLICT(name) DO UPDATE SET next = next + 1 RETURNING next",
+                               (name,)).fetchone()[0]
+                candidate = name if n == 1 else f"{stem}({n}).{extension}"
+                path = self.file_path(candidate)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                try:
+                    os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                except FileExistsError:
+                    # Written before the counter existed; it skips past it once
+                    continue
+                db.execute("INSERT OR REPLACE INTO reservations (name, created) VALUES (?, ?)",
+                           (candidate, time.time()))
+                return path
+
+    def record(self, path, title, file_format, job_id=None, allow_empty=False):
+        """
+        Indexes a finished file (placed at file_path(name)) and returns its path.
+        An empty file is an allocate() placeholder nothing was written to: it is
+        discarded and ValueError raised, unless allow_empty (e.g. for uploads).
+        """
+        name = os.path.basename(path)
+        size = os.stat(path).st_size
+        if not size and not allow_empty:
+            self.discard(path)
+            raise ValueError(f"Nothing was written to {name}.")
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO artifacts (name, title, format, size, created, accessed, job_id) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?)", (name, title, file_format, size, now, now, job_id))
+            db.execute("DELETE FROM reservations WHERE name = ?", (name,))
+        self.maybe_sweep()
+        return path
+
+    def lookup(self, name):
+        """Path of a stored file, marked as used, or None if it is not in the index."""
+        path = self.file_path(name)
+        if os.path.exists(path) and self.get(name):
+            self.touch(name)
+            return path
+        return None
+
+    def put(self, name, data, title, file_format):
+        """Writes `data` as `name` (see atomic_write), indexes it and returns its path."""
+        path = self.file_path(name)
+        atomic_write(path, data)
+        return self.record(path, title, file_format, allow_empty=True)
+
+    def discard(self, path):
+        """Releases an allocated path that will not be recorded: deletes the file and its reservation."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        with self._connect() as db:
+            db.execute("DELETE FROM reservations WHERE name = ?", (os.path.basename(path),))
+
+    def get(self, name):
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM artifacts WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def touch(self, name):
+        """Marks a file as used, moving it to the back of the eviction order."""
+        with self._connect() as db:
+            db.execute("UPDATE artifacts SET accessed = ? WHERE name = ?", (time.time(), name))
+
+    def list(self, job_id=None, limit=100):
+        query = "SELECT * FROM artifacts"
+        args = ()
+        if job_id is not None:
+            query += " WHERE job_id = ?"
+            args = (job_id,)
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(f"{query} ORDER BY created DESC LIMIT ?", (*args, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    # === Retention ===
+
+    def maybe_sweep(self):
+        if time.time() - self.last_sweep < SWEEP_INTERVAL or not self.sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self.sweep()
+        finally:
+            self.sweep_lock.release()
+
+    def sweep(self, now=None):
+        """Applies the age and size limits; returns the names removed."""
+        now = now or time.time()
+        self.last_sweep = now
+        with self._connect() as db:
+            expired = [row[0] for row in db.execute(
+                "SELECT name FROM reservations WHERE created < ?", (now - RESERVATION_TTL,))]
+            expired += [row[0] for row in db.execute(
+                "SELECT name FROM artifacts WHERE accessed < ?", (now - self.max_age,))]
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts WHERE accessed >= ?",
+                               (now - self.max_age,)).fetchone()[0]
+            if total > self.max_bytes:
+                # Least recently accessed first
+                for name, size in db.execute("SELECT name, size FROM artifacts WHERE accessed >= ? "
+                                             "ORDER BY accessed", (now - self.max_age,)):
+                    if total <= self.max_bytes:
+                        break
+                    expired.append(name)
+                    total -= size
+            for name in expired:
+                try:
+                    os.remove(self.file_path(name))
+                except FileNotFoundError:
+                    pass
+            db.executemany("DELETE FROM artifacts WHERE name = ?", ((name,) for name in expired))
+            db.executemany("DELETE FROM reservations WHERE name = ?", ((name,) for name in expired))
+        return expired
+
+
+output_store = ArtifactStore(OUTPUT_DIR, OUTPUT_RETENTION_DAYS * DAY, OUTPUT_MAX_BYTES)
+uploaded_files = ArtifactStore(UPLOAD_DIR, UPLOAD_RETENTION_DAYS * DAY, UPLOAD_MAX_BYTES)
+text_cache = ArtifactStore(os.path.join(CACHE_DIR, 'extracted'), CACHE_RETENTION_DAYS * DAY, CACHE_MAX_BYTES)
+chunk_cache = ArtifactStore(os.path.join(CACHE_DIR, 'chunks'), CACHE_RETENTION_DAYS * DAY, CACHE_MAX_BYTES)
@@ -0,0 +1,108 @@
+"""
+DOCX generation throughput: named styles + bulk lxml body vs the per-run
+python-docx writer it replaced (direct formatting on every run, tables as text).
+
+    python benchmarks/bench_docx.py [--mb 1] [--repeat 3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document  # noqa: E402
+from docx.enum.text import WD_ALIGN_PARAGRAPH  # noqa: E402
+from docx.shared import Pt  # noqa: E402
+
+from bench_markdown_parse import make_corpus  # noqa: E402
+from doc_writer import (BODY_COLOR, SUBSUBHEADING_COLOR, TITLE_COLOR, add_footer, add_styles,  # noqa: E402
+                        write_docx_nodes)
+from markdown_ir import Bullet, Equation, Heading, Paragraph, Table, parse_markdown  # noqa: E402
+
+
+# === Legacy writer (per-paragraph object API) ===
+
+def legacy_add_heading(doc, text, font_size, font_color):
+    para = doc.add_paragraph()
+    run = para.add_run(text)
+    run.font.size = Pt(font_size)
+    run.font.bold = True
+    run.font.color.rgb = font_color
+    para.alignment = WD_ALIGN_PARAGRAPH.LEFT
+
+
+def legacy_add_body_line(doc, text, style=None):
+    para = doc.add_paragraph(style=style)
+    run = para.add_run(text)
+    run.font.size = Pt(12)
+    run.font.color.rgb = BODY_COLOR
+    para.alignment = WD_ALIGN_PARAGRAPH.LEFT
+
+
+def legacy_write_docx_nodes(nodes, output_path, title):
+    doc = Document()
+    para = doc.add_paragraph()
+    run = para.add_run(title)
+    run.font.size = Pt(16)
+    run.font.bold = True
+    run.font.color.rgb = TITLE_COLOR
+    para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for node in nodes:
+        kind = type(node)
+        if kind is Heading:
+            size, color = {1: (16, TITLE_COLOR), 2: (14, TITLE_COLOR)}.get(node.level, (12, SUBSUBHEADING_COLOR))
+            legacy_add_heading(doc, node.text, size, color)
+        elif kind is Bullet:
+            legacy_add_body_line(doc, node.text, style='List Bullet')
+        elif kind is Paragraph:
+            legacy_add_body_line(doc, node.text)
+        elif kind is Table or kind is Equation:
+            for line in node.lines:
+                legacy_add_body_line(doc, line)
+    # The shared footer uses the named character style; a constant cost
+    add_styles(doc)
+    add_footer(doc)
+    doc.save(output_path)
+
+
+# === Benchmark ===
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    nodes = parse_markdown(make_corpus(int(args.mb * 1024 * 1024)))
+    blocks = len(nodes)
+    title = "Benchmark Document"
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.docx")
+        new_path = os.path.join(tmp, "styled.docx")
+        legacy = best_of(lambda: legacy_write_docx_nodes(nodes, legacy_path, title), args.repeat)
+        styled = best_of(lambda: write_docx_nodes(nodes, new_path, title), args.repeat)
+        sizes = os.path.getsize(legacy_path), os.path.getsize(new_path)
+
+    print(f"document: {blocks} IR nodes")
+    print(f"{'':24}{'seconds':>10}{'nodes/s':>12}{'bytes':>12}")
+    print(f"{'legacy per-run API':24}{legacy:10.3f}{blocks / legacy:12.0f}{sizes[0]:12d}")
+    print(f"{'styles + bulk XML':24}{styled:10.3f}{blocks / styled:12.0f}{sizes[1]:12d}")
+    print(f"speedup: {legacy / styled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
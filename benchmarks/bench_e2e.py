@@ -0,0 +1,336 @@
+"""
+End-to-end pipeline benchmark against the local mock LLM (mock_llm.py).
+Generated TXT/PDF/CSV inputs are driven through run_agent_from_api and
+through POST /generate (upload, job queue, status polling). For every case it
+reports throughput, p50/p95/p99 latency, peak RSS and per-stage timings, and
+saves everything as JSON under benchmarks/results/ so runs can be compared.
+
+    python benchmarks/bench_e2e.py [--inputs txt pdf csv] [--sizes 1KB 100KB 1MB 10MB 100MB]
+                                   [--targets api http] [--format docx] [--mode chunked] [--repeat 5]
+                                   [--latency 0.05] [--tokens-per-second 0] [--error-rate 0]
+                                   [--compare benchmarks/results/<earlier run>.json]
+
+Every run is cold: the extracted-text and chunk caches move to a fresh
+directory per run and the LLM response cache is disabled. The Groq rate
+limits are lifted unless GROQ_REQUESTS_PER_MINUTE / GROQ_TOKENS_PER_MINUTE
+are set, so the mock sets the pace. Peak RSS is that of this process; render
+and PDF pool workers run in processes of their own. Large PDFs take long to
+generate and to parse; pick --sizes accordingly.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from bench_markdown_parse import make_corpus  # noqa: E402
+from mock_llm import MockLLM  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+SIZE_UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+PROMPT = "Write a structured report on the attached material."
+POLL_INTERVAL = 0.02   # seconds between job status requests
+RSS_INTERVAL = 0.01    # seconds between RSS samples
+
+
+# === Corpora ===
+
+def parse_size(text):
+    text = text.strip().upper()
+    for unit, factor in SIZE_UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+def write_txt(path, size):
+    block = make_corpus(min(size, 4 * 1024 * 1024))
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < size:
+            piece = block[:size - written]
+            f.write(piece)
+            written += len(piece)
+
+def write_csv(path, size):
+    rng = random.Random(size)
+    sites = [f"site-{i:02d}" for i in range(12)]
+    statuses = ("ok", "ok", "ok", "degraded", "maintenance")
+    written = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        header = "date,site,reading,load_pct,status,notes\n"
+        f.write(header)
+        written += len(header)
+        day = 0
+        while written < size:
+            rows = []
+            for _ in range(1000):
+                day += 1
+                rows.append(f"2024-{1 + day // 28 % 12:02d}-{1 + day % 28:02d},{rng.choice(sites)},"
+                            f"{rng.gauss(41.7, 9.3):.3f},{rng.randint(0, 100)},{rng.choice(statuses)},"
+                            f"reading {day} within range\n")
+            chunk = "".join(rows)[:size - written]
+            f.write(chunk)
+            written += len(chunk)
+
+def write_pdf(path, size):
+    """Pages of text until the file reaches `size`; the page count is extrapolated from a sample."""
+    from reportlab.lib.pagesizes import LETTER
+    from reportlab.pdfgen import canvas
+    lines = [line[:100] for line in make_corpus(64 * 1024).splitlines() if line.strip()]
+
+    def render(pages):
+        c = canvas.Canvas(path, pagesize=LETTER)
+        for page in range(pages):
+            text = c.beginText(54, 740)
+            text.setFont("Helvetica", 10)
+            for i in range(60):
+                text.textLine(lines[(page * 60 + i) % len(lines)])
+            c.drawText(text)
+            c.showPage()
+        c.save()
+
+    render(4)
+    per_page = os.path.getsize(path) / 4
+    render(max(1, round(size / per_page)))
+
+CORPUS_WRITERS = {'txt': write_txt, 'csv': write_csv, 'pdf': write_pdf}
+
+
+# === Measurement ===
+
+class PeakRSS:
+    """Samples this process's resident set size in a background thread while active."""
+
+    def __init__(self, interval=RSS_INTERVAL):
+        self.interval = interval
+        self.peak = 0
+        self.done = threading.Event()
+
+    @staticmethod
+    def current():
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            import resource   # lifetime peak, the best available without /proc
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _sample(self):
+        while not self.done.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+    def __enter__(self):
+        self.peak = self.current()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.done.set()
+        self.thread.join()
+        self.peak = max(self.peak, self.current())
+        return False
+
+def percentile(values, q):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+def median(values):
+    return percentile(values, 50)
+
+def use_fresh_caches(run_dir):
+    import input_handler
+    import text_chunker
+    from artifact_store import CACHE_MAX_BYTES, CACHE_RETENTION_DAYS, DAY, ArtifactStore
+    input_handler.text_cache = ArtifactStore(os.path.join(run_dir, 'extracted'), CACHE_RETENTION_DAYS * DAY,
+                                             CACHE_MAX_BYTES)
+    text_chunker.chunk_cache = ArtifactStore(os.path.join(run_dir, 'chunks'), CACHE_RETENTION_DAYS * DAY,
+                                             CACHE_MAX_BYTES)
+
+
+# === Targets ===
+
+def run_api(path, args):
+    import metrics
+    from agent_orchestrator import run_agent_from_api
+    with metrics.trace() as trace:
+        start = time.perf_counter()
+        run_agent_from_api(PROMPT, path, output_format=args.format, use_cache=False, mode=args.mode)
+        elapsed = time.perf_counter() - start
+    return elapsed, trace.summary()['stages']
+
+def run_http(client, path, args):
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        response = client.post('/generate', headers={'Accept': 'application/json'},
+                               data={'prompt': PROMPT, 'doc_type': args.format, 'mode': args.mode,
+                                     'document': (f, os.path.basename(path))})
+    if response.status_code != 202:
+        raise RuntimeError(f"/generate answered {response.status_code}")
+    status_url = response.get_json()['status_url']
+    while True:
+        status = client.get(status_url).get_json()
+        if status['status'] in ('done', 'failed'):
+            break
+        time.sleep(POLL_INTERVAL)
+    elapsed = time.perf_counter() - start
+    if status['status'] == 'failed':
+        raise RuntimeError(status['error'])
+    return elapsed, (status['timings'] or {}).get('stages', {})
+
+def run_case(target, kind, size_label, path, args, client, mock, work_dir):
+    latencies, stage_runs, peaks, errors = [], [], [], []
+    before = mock.snapshot() if mock else None
+    for run in range(args.repeat):
+        use_fresh_caches(os.path.join(work_dir, f"{target}-{kind}-{size_label}-{run}"))
+        try:
+            # The pipeline reports progress on stdout; keep the table readable
+            with PeakRSS() as rss, contextlib.redirect_stdout(io.StringIO()):
+                if target == 'api':
+                    elapsed, stages = run_api(path, args)
+                else:
+                    elapsed, stages = run_http(client, path, args)
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append(elapsed)
+        stage_runs.append(stages)
+        peaks.append(rss.peak)
+
+    size = os.path.getsize(path)
+    case = {'target': target, 'input': kind, 'size': size_label, 'bytes': size, 'format': args.format,
+            'mode': args.mode, 'runs': len(latencies), 'errors': errors}
+    if latencies:
+        p50 = median(latencies)
+        case.update(
+            latency={'p50': p50, 'p95': percentile(latencies, 95), 'p99': percentile(latencies, 99),
+                     'mean': sum(latencies) / len(latencies), 'min': min(latencies), 'max': max(latencies)},
+            throughput_mb_s=size / p50 / 1024 ** 2,
+            peak_rss_mb=max(peaks) / 1024 ** 2,
+            stages={stage: {'seconds': median([runs.get(stage, {}).get('seconds', 0.0) for runs in stage_runs]),
+                            'count': median([runs.get(stage, {}).get('count', 0) for runs in stage_runs])}
+                    for stage in sorted({stage for runs in stage_runs for stage in runs})})
+    if mock:
+        after = mock.snapshot()
+        case['llm'] = {field: after[field] - before[field] for field in after}
+    return case
+
+
+# === Reporting ===
+
+def case_key(case):
+    return (case['target'], case['input'], case['size'], case['format'], case['mode'])
+
+def print_case(case):
+    label = f"{case['target']:5}{case['input']:5}{case['size']:>7}"
+    if 'latency' not in case:
+        print(f"{label}  failed: {case['errors'][:1]}")
+        return
+    latency = case['latency']
+    slowest = sorted(case['stages'].items(), key=lambda item: -item[1]['seconds'])[:3]
+    stages = ", ".join(f"{stage} {entry['seconds']:.3f}s" for stage, entry in slowest)
+    print(f"{label}{latency['p50']:9.3f}{latency['p95']:9.3f}{latency['p99']:9.3f}"
+          f"{case['throughput_mb_s']:10.2f}{case['peak_rss_mb']:9.1f}  {stages}")
+
+def compare(cases, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {case_key(case): case for case in json.load(f)['cases']}
+    print(f"\ncompared with {baseline_path} (p50 latency)")
+    for case in cases:
+        old = baseline.get(case_key(case))
+        if old and 'latency' in old and 'latency' in case:
+            ratio = case['latency']['p50'] / old['latency']['p50']
+            print(f"{case['target']:5}{case['input']:5}{case['size']:>7}"
+                  f"{old['latency']['p50']:9.3f} -> {case['latency']['p50']:.3f}  ({ratio:.2f}x)")
+
+def git_revision():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                capture_output=True, text=True, timeout=10)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inputs", nargs="+", default=["txt", "pdf", "csv"], choices=sorted(CORPUS_WRITERS))
+    parser.add_argument("--sizes", nargs="+", default=["1KB", "100KB", "1MB", "10MB", "100MB"])
+    parser.add_argument("--targets", nargs="+", default=["api", "http"], choices=["api", "http"])
+    parser.add_argument("--format", default="docx", choices=["docx", "pdf", "pptx"])
+    parser.add_argument("--mode", default="chunked", choices=["chunked", "mapreduce"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock LLM seconds to first byte")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="mock LLM generation speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock LLM requests answered 429")
+    parser.add_argument("--llm-url", help="use this chat-completions endpoint instead of the built-in mock")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/e2e-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare p50 latencies against")
+    args = parser.parse_args()
+    sizes = [(label, parse_size(label)) for label in args.sizes]
+
+    mock = None
+    if args.llm_url:
+        os.environ["GROQ_API_URL"] = args.llm_url
+    else:
+        mock = MockLLM(args.latency, args.tokens_per_second, args.error_rate)
+        os.environ["GROQ_API_URL"] = mock.start()
+    # Settings the pipeline reads at import time
+    os.environ.setdefault("GROQ_REQUESTS_PER_MINUTE", "1000000")
+    os.environ.setdefault("GROQ_TOKENS_PER_MINUTE", "1000000000")
+    os.environ.setdefault("LLM_CACHE_DISABLED", "1")
+    os.environ.setdefault("MAX_UPLOAD_BYTES", str(2 * max(size for _, size in sizes) + 1024 ** 2))
+
+    client = None
+    if "http" in args.targets:
+        from app import app
+        client = app.test_client()
+
+    cases = []
+    print(f"{'':17}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'MB/s':>10}{'RSS MB':>9}  slowest stages")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for kind in args.inputs:
+            for label, size in sizes:
+                path = os.path.join(work_dir, f"input-{label}.{kind}")
+                CORPUS_WRITERS[kind](path, size)
+                for target in args.targets:
+                    case = run_case(target, kind, label, path, args, client, mock, work_dir)
+                    print_case(case)
+                    cases.append(case)
+                os.remove(path)
+
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'settings': {'repeat': args.repeat, 'format': args.format, 'mode': args.mode,
+                     'llm': args.llm_url or {'latency': args.latency, 'tokens_per_second': args.tokens_per_second,
+                                             'error_rate': args.error_rate}},
+        'cases': cases,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults saved to {output}")
+    if args.compare:
+        compare(cases, args.compare)
+    if mock:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
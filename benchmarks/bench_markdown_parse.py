@@ -0,0 +1,165 @@
+"""
+Markdown parse throughput: shared IR tokenizer vs the per-writer parsers it replaced.
+
+The legacy functions below are the clean_text / parse_sections pair that
+doc_writer and pdf_writer each carried, plus the per-line bullet regex of
+their body renderers and ppt_writer's extract_sections split.
+
+    python benchmarks/bench_markdown_parse.py [--mb 4] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markdown_ir import parse_markdown  # noqa: E402
+
+
+# === Legacy parsers (pre-IR) ===
+
+def legacy_clean_text(text):
+    lines = text.splitlines()
+    cleaned_lines = []
+    in_table = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('|') and stripped.endswith('|'):
+            in_table = True
+            cleaned_lines.append(line)
+            continue
+        elif in_table and stripped == '':
+            in_table = False
+            cleaned_lines.append(line)
+            continue
+        elif in_table:
+            cleaned_lines.append(line)
+            continue
+        heading_match = re.match(r'^(#{1,3})\s+(.*)$', line)
+        if heading_match:
+            hashes = heading_match.group(1)
+            content = heading_match.group(2)
+            content = re.sub(r'[*=_\-\s]+$', '', content)
+            content = re.sub(r'[*_]+', '', content)
+            cleaned_lines.append(f"{hashes} {content.strip()}")
+            continue
+        if re.match(r'^[=\-_*]{3,}$', stripped):
+            continue
+        clean_line = re.sub(r'[*_]+', '', line)
+        cleaned_lines.append(clean_line)
+    return "\n".join(cleaned_lines)
+
+
+def legacy_parse_sections(text):
+    pattern = re.compile(r'^(#{1,3})\s+(.*)$', re.MULTILINE)
+    matches = list(pattern.finditer(text))
+    if not matches:
+        return [{'level': 0, 'heading': '', 'body': text.strip()}]
+    sections = []
+    if matches[0].start() > 0:
+        pre_content = text[:matches[0].start()].strip()
+        if pre_content:
+            sections.append({'level': 0, 'heading': '', 'body': pre_content})
+    for i, match in enumerate(matches):
+        level = len(match.group(1))
+        heading = match.group(2).strip()
+        start = match.end()
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = text[start:end].strip()
+        sections.append({'level': level, 'heading': heading, 'body': body})
+    return sections
+
+
+def legacy_classify_lines(sections):
+    # What add_body_content / draw_body_content did per line
+    out = []
+    for sec in sections:
+        for line in sec['body'].splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if re.match(r'^[-+•]\s+', line):
+                out.append(('bullet', re.sub(r'^[-+•]\s+', '', line)))
+            else:
+                out.append(('text', line))
+    return out
+
+
+def legacy_ppt_split(content):
+    sections = re.split(r'\n(?=#+\s|^Slide\s*\d+:|^\*\*.+?\*\*|^\w.+?:)', content, flags=re.MULTILINE)
+    structured = []
+    for section in sections:
+        lines = section.strip().splitlines()
+        if len(lines) < 2:
+            continue
+        bullets = [re.sub(r'^[-•*0-9. ]+', '', line).replace('*', '') for line in lines[1:]]
+        structured.append((lines[0], bullets))
+    return structured
+
+
+def legacy_writer_parse(text):
+    return legacy_classify_lines(legacy_parse_sections(legacy_clean_text(text)))
+
+
+# === Corpus ===
+
+def make_corpus(size_bytes, seed=7):
+    rng = random.Random(seed)
+    words = ("solar grid power energy report analysis demand supply storage cost "
+             "efficiency **critical** _factor_ output capacity").split()
+
+    def sentence(n):
+        return " ".join(rng.choice(words) for _ in range(n)).capitalize() + "."
+
+    parts = []
+    size = 0
+    while size < size_bytes:
+        block = [f"## {sentence(4)}", "", sentence(30), ""]
+        block += [f"- {sentence(10)}" for _ in range(rng.randint(2, 6))]
+        block += ["", f"### {sentence(3)} ---", sentence(40), ""]
+        if rng.random() < 0.3:
+            block += ["| Metric | Value |", "|---|---|"] + [f"| {rng.choice(words)} | {rng.randint(1, 99)} |" for _ in range(4)] + [""]
+        if rng.random() < 0.1:
+            block += ["$$E = mc^2$$", ""]
+        text = "\n".join(block) + "\n"
+        parts.append(text)
+        size += len(text.encode('utf-8'))
+    return "# Benchmark Document\n\n" + "".join(parts)
+
+
+def best_of(fn, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = make_corpus(int(args.mb * 1024 * 1024))
+    mb = len(corpus.encode('utf-8')) / (1024 * 1024)
+
+    legacy_one = best_of(legacy_writer_parse, corpus, args.repeat)
+    ir_one = best_of(parse_markdown, corpus, args.repeat)
+    legacy_fanout = legacy_one * 2 + best_of(legacy_ppt_split, corpus, args.repeat)
+
+    print(f"corpus: {mb:.2f} MB, {corpus.count(chr(10))} lines")
+    print(f"{'':28}{'seconds':>10}{'MB/s':>10}")
+    print(f"{'legacy, one writer':28}{legacy_one:10.3f}{mb / legacy_one:10.1f}")
+    print(f"{'IR parse_markdown':28}{ir_one:10.3f}{mb / ir_one:10.1f}")
+    print(f"{'legacy, docx+pdf+pptx':28}{legacy_fanout:10.3f}{mb / legacy_fanout:10.1f}")
+    print(f"{'IR, parse once for all':28}{ir_one:10.3f}{mb / ir_one:10.1f}")
+    print(f"speedup: {legacy_one / ir_one:.1f}x single writer, {legacy_fanout / ir_one:.1f}x fan-out")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+PDF backends compared on one document: the planned canvas writer against
+the platypus flowable writer (speed, output size, page count).
+
+    python benchmarks/bench_pdf_backends.py [--pages 200] [--repeat 3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pdf_layout import corpus_for_pages  # noqa: E402
+from pdf_writer import PDF_BACKENDS, write_pdf_nodes  # noqa: E402
+
+
+def render(nodes, path, title, backend, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            write_pdf_nodes(nodes, path, title, backend)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def count_pages(path):
+    with open(path, 'rb') as f:
+        return f.read().count(b"/Type /Page\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    nodes, _ = corpus_for_pages(args.pages)
+    title = "Benchmark Document"
+    print(f"document: {len(nodes)} IR nodes")
+    print(f"{'backend':12}{'seconds':>10}{'pages':>8}{'pages/s':>10}{'bytes':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in PDF_BACKENDS:
+            path = os.path.join(tmp, f"{backend}.pdf")
+            seconds = render(nodes, path, title, backend, args.repeat)
+            pages = count_pages(path)
+            print(f"{backend:12}{seconds:10.3f}{pages:8d}{pages / seconds:10.1f}{os.path.getsize(path):12d}")
+
+
+if __name__ == "__main__":
+    main()
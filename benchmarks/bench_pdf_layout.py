@@ -0,0 +1,175 @@
+"""
+PDF rendering throughput: planned layout with cached word widths vs the
+canvas writer it replaced (whole-line stringWidth per word, drawString per line).
+
+    python benchmarks/bench_pdf_layout.py [--pages 200] [--repeat 3]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.pagesizes import LETTER  # noqa: E402
+from reportlab.pdfgen import canvas  # noqa: E402
+
+from bench_markdown_parse import make_corpus  # noqa: E402
+from markdown_ir import Bullet, Paragraph, Spacer, group_sections, parse_markdown  # noqa: E402
+from pdf_layout import (BODY_COLOR, BOTTOM_MARGIN, LEFT_MARGIN, LINE_HEIGHT, PAGE_HEIGHT, PAGE_WIDTH,  # noqa: E402
+                        RIGHT_MARGIN, SUBHEADING_COLOR, SUBSUBHEADING_COLOR, TITLE_COLOR, TOP_MARGIN,
+                        layout_document)
+from pdf_writer import draw_footer, write_pdf_nodes  # noqa: E402
+
+
+# === Legacy canvas writer (pre-layout engine) ===
+
+def legacy_wrap_text(text, max_width, c, font_name, font_size):
+    words = text.split()
+    lines = []
+    current_line = ""
+    for word in words:
+        test_line = f"{current_line} {word}".strip()
+        if c.stringWidth(test_line, font_name, font_size) <= max_width:
+            current_line = test_line
+        else:
+            if current_line:
+                lines.append(current_line)
+            current_line = word
+    if current_line:
+        lines.append(current_line)
+    return lines
+
+
+def legacy_check_page_break(c, y):
+    if y < BOTTOM_MARGIN + 50:
+        draw_footer(c)
+        c.showPage()
+        y = PAGE_HEIGHT - TOP_MARGIN
+        c.setFont("Helvetica", 12)
+        c.setFillColor(BODY_COLOR)
+    return y
+
+
+def legacy_draw_text_line(c, text, y, max_width):
+    for wline in legacy_wrap_text(text, max_width, c, "Helvetica", 12):
+        c.drawString(LEFT_MARGIN, y, wline)
+        y -= LINE_HEIGHT
+    return y
+
+
+def legacy_draw_bullet_line(c, text, y, max_width):
+    bullet_width = c.stringWidth("• ", "Helvetica", 12) + 6
+    wrapped = legacy_wrap_text(text, max_width - bullet_width, c, "Helvetica", 12)
+    for i, wline in enumerate(wrapped):
+        x = LEFT_MARGIN + bullet_width if i == 0 else LEFT_MARGIN + bullet_width + 6
+        c.drawString(x, y, wline)
+        y -= LINE_HEIGHT
+    return y
+
+
+def legacy_draw_body_content(c, nodes, y):
+    c.setFont("Helvetica", 12)
+    c.setFillColor(BODY_COLOR)
+    max_width = PAGE_WIDTH - LEFT_MARGIN - RIGHT_MARGIN
+    for node in nodes:
+        kind = type(node)
+        if kind is Spacer:
+            y -= 12 * node.lines
+            continue
+        if kind is Bullet:
+            y = legacy_draw_bullet_line(c, node.text, y, max_width)
+        elif kind is Paragraph:
+            y = legacy_draw_text_line(c, node.text, y, max_width)
+        else:
+            for line in node.lines:
+                y = legacy_draw_text_line(c, line, y, max_width)
+                y = legacy_check_page_break(c, y)
+            continue
+        y = legacy_check_page_break(c, y)
+    return y
+
+
+def legacy_draw_heading(c, text, y, size, color):
+    c.setFont("Helvetica-Bold", size)
+    c.setFillColor(color)
+    c.drawString(LEFT_MARGIN, y, text)
+    return y - size - 6
+
+
+def legacy_write_pdf_nodes(nodes, output_path, title):
+    c = canvas.Canvas(output_path, pagesize=LETTER)
+    y = PAGE_HEIGHT - TOP_MARGIN
+    if title:
+        clean_title = re.sub(r'^[#*\-_=\s]+|[#*\-_=\s]+$', '', title).strip()
+        c.setFont("Helvetica-Bold", 16)
+        c.setFillColor(TITLE_COLOR)
+        c.drawCentredString(PAGE_WIDTH / 2, y, clean_title)
+        y -= 36
+    c.setFont("Helvetica", 12)
+    c.setFillColor(BODY_COLOR)
+    for heading, body_nodes in group_sections(nodes):
+        if heading is not None:
+            if heading.level == 1:
+                y = legacy_draw_heading(c, heading.text, y, 16, TITLE_COLOR)
+            elif heading.level == 2:
+                y = legacy_draw_heading(c, heading.text, y, 14, SUBHEADING_COLOR)
+            else:
+                y = legacy_draw_heading(c, heading.text, y, 12, SUBSUBHEADING_COLOR)
+        y = legacy_draw_body_content(c, body_nodes, y)
+        y -= LINE_HEIGHT
+        y = legacy_check_page_break(c, y)
+    draw_footer(c)
+    c.save()
+
+
+# === Benchmark ===
+
+def corpus_for_pages(pages):
+    """Grows the benchmark corpus until it lays out to at least `pages` pages."""
+    size = 64 * 1024
+    while True:
+        nodes = parse_markdown(make_corpus(size))
+        count = len(layout_document(nodes, "Benchmark Document"))
+        if count >= pages:
+            return nodes, count
+        size = int(size * pages / count * 1.05) + 1024
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    nodes, pages = corpus_for_pages(args.pages)
+    title = "Benchmark Document"
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.pdf")
+        new_path = os.path.join(tmp, "planned.pdf")
+        legacy = best_of(lambda: legacy_write_pdf_nodes(nodes, legacy_path, title), args.repeat)
+        layout = best_of(lambda: layout_document(nodes, title), args.repeat)
+        planned = best_of(lambda: write_pdf_nodes(nodes, new_path, title), args.repeat)
+        sizes = os.path.getsize(legacy_path), os.path.getsize(new_path)
+
+    print(f"document: {pages} pages, {len(nodes)} IR nodes")
+    print(f"{'':24}{'seconds':>10}{'pages/s':>10}")
+    print(f"{'legacy canvas writer':24}{legacy:10.3f}{pages / legacy:10.1f}")
+    print(f"{'layout plan only':24}{layout:10.3f}{pages / layout:10.1f}")
+    print(f"{'planned writer':24}{planned:10.3f}{pages / planned:10.1f}")
+    print(f"speedup: {legacy / planned:.1f}x; file size {sizes[0]} -> {sizes[1]} bytes")
+
+
+if __name__ == "__main__":
+    main()
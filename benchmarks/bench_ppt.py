@@ -0,0 +1,118 @@
+"""
+PPTX rendering throughput at 10, 100 and 500 slides: per-slide XML assembled
+into the template package (inline and across the slide pool) vs building the
+same slides through the python-pptx shape API.
+
+    python benchmarks/bench_ppt.py [--slides 10 100 500] [--workers 4] [--repeat 3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pptx import Presentation  # noqa: E402
+from pptx.enum.text import PP_ALIGN  # noqa: E402
+
+import pools  # noqa: E402
+import ppt_writer  # noqa: E402
+from bench_markdown_parse import make_corpus  # noqa: E402
+from markdown_ir import parse_markdown  # noqa: E402
+from ppt_writer import (BODY_PLACEHOLDER_IDX, CONTENT_HEIGHT, CONTENT_LAYOUT, CONTENT_LEFT, CONTENT_TOP,  # noqa: E402
+                        CONTENT_WIDTH, COVER_LAYOUT, TABLE_FONT_SIZE, TABLE_HEADER_BG, TABLE_LAYOUT,
+                        extract_sections, format_cover_title, get_template_bytes, write_ppt_sections)
+
+
+# === python-pptx object API writer (pre-XML assembly) ===
+
+def pptx_write_sections(sections, output_path, filename_title):
+    prs = Presentation(io.BytesIO(get_template_bytes()))
+    cover = prs.slides.add_slide(prs.slide_layouts.get_by_name(COVER_LAYOUT))
+    cover.shapes.title.text_frame.paragraphs[0].text = format_cover_title(filename_title)
+    layouts = {"TEXT": prs.slide_layouts.get_by_name(CONTENT_LAYOUT),
+               "TABLE": prs.slide_layouts.get_by_name(TABLE_LAYOUT)}
+    for kind, title, body in sections:
+        slide = prs.slides.add_slide(layouts[kind])
+        slide.shapes.title.text_frame.paragraphs[0].text = title
+        if kind == "TEXT":
+            tf = slide.placeholders[BODY_PLACEHOLDER_IDX].text_frame
+            for i, line in enumerate(body):
+                p = tf.paragraphs[0] if i == 0 else tf.add_paragraph()
+                run = p.add_run()
+                run.text = line
+                if line.endswith(":"):
+                    run.font.bold = True
+        else:
+            table = slide.shapes.add_table(len(body), len(body[0]), CONTENT_LEFT, CONTENT_TOP,
+                                           CONTENT_WIDTH, CONTENT_HEIGHT).table
+            for r, row in enumerate(body):
+                for c, value in enumerate(row):
+                    cell = table.cell(r, c)
+                    cell.text = value
+                    para = cell.text_frame.paragraphs[0]
+                    para.font.size = TABLE_FONT_SIZE
+                    para.font.name = "Segoe UI"
+                    para.alignment = PP_ALIGN.CENTER if r == 0 else PP_ALIGN.LEFT
+                    if r == 0:
+                        cell.fill.solid()
+                        cell.fill.fore_color.rgb = TABLE_HEADER_BG
+    prs.save(output_path)
+
+
+# === Benchmark ===
+
+def deck_sections(slides):
+    """At least `slides` slide specs from the benchmark corpus (tables included)."""
+    size = 64 * 1024
+    while True:
+        sections = extract_sections(parse_markdown(make_corpus(size)))
+        if len(sections) >= slides:
+            return sections[:slides]
+        size = int(size * slides / max(len(sections), 1) * 1.1) + 1024
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slides", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # The pool column always uses the pool, whatever the deck size
+    ppt_writer.PPT_WORKERS = pools.POOL_WORKERS = args.workers
+    ppt_writer.PPT_PARALLEL_SLIDES = 1
+    get_template_bytes()
+    pools.get_process_pool().submit(int).result()   # worker start-up is not part of a request
+
+    title = "Benchmark Deck"
+    print(f"cpus: {os.cpu_count()}, slide pool workers: {args.workers} (slides/s)")
+    # inline/pptx: XML assembly over the shape API; pool/inline: above 1.0x only if the pool pays off
+    print(f"{'slides':>8}{'python-pptx':>14}{'xml inline':>14}{'xml pool':>14}{'inline/pptx':>13}{'pool/inline':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "deck.pptx")
+        for slides in args.slides:
+            sections = deck_sections(slides)
+            n = len(sections) + 1
+            api = best_of(lambda: pptx_write_sections(sections, path, title), args.repeat)
+            inline = best_of(lambda: write_ppt_sections(sections, path, None, title, workers=1), args.repeat)
+            pooled = best_of(lambda: write_ppt_sections(sections, path, None, title, workers=args.workers), args.repeat)
+            print(f"{slides:8d}{n / api:14.1f}{n / inline:14.1f}{n / pooled:14.1f}"
+                  f"{api / inline:12.1f}x{inline / pooled:12.2f}x")
+
+
+if __name__ == "__main__":
+    main()
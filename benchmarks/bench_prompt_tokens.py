@@ -0,0 +1,55 @@
+"""
+Input tokens per document: the template layout (static system prefix, chunk
+sent once as the user message) vs the legacy layout that appended the whole
+prompt to the instructions and sent it again as the user message.
+
+    python benchmarks/bench_prompt_tokens.py [--mb 1] [--chunk-tokens 700]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_markdown_parse import make_corpus  # noqa: E402
+from prompts import DOCUMENT_PROMPT  # noqa: E402
+from text_chunker import chunk_text, count_tokens  # noqa: E402
+
+
+# === Legacy layout (instructions + prompt as system, prompt again as user) ===
+
+def legacy_messages(prompt):
+    return [
+        {"role": "system", "content": DOCUMENT_PROMPT.system + "\n" + prompt},
+        {"role": "user", "content": prompt},
+    ]
+
+
+# === Benchmark ===
+
+def input_tokens(messages):
+    return sum(count_tokens(message["content"]) for message in messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=1)
+    parser.add_argument("--chunk-tokens", type=int, default=700)
+    args = parser.parse_args()
+
+    prompt = "Write a structured report on the attached material."
+    chunks = chunk_text(f"{prompt}\n\n{make_corpus(int(args.mb * 1024 * 1024))}", args.chunk_tokens)
+    legacy = sum(input_tokens(legacy_messages(chunk)) for chunk in chunks)
+    templated = sum(input_tokens(DOCUMENT_PROMPT.messages(chunk)) for chunk in chunks)
+    prefix = count_tokens(DOCUMENT_PROMPT.system)
+
+    print(f"{len(chunks)} chunks of up to {args.chunk_tokens} tokens, {prefix}-token static prefix")
+    print(f"{'':20}{'tokens':>12}{'per chunk':>12}")
+    print(f"{'legacy layout':20}{legacy:12d}{legacy / len(chunks):12.0f}")
+    print(f"{'template layout':20}{templated:12d}{templated / len(chunks):12.0f}")
+    print(f"saved: {1 - templated / legacy:.0%} of input tokens "
+          f"({prefix * len(chunks) / templated:.0%} of what remains is the cacheable prefix)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Cold-start import budget check.
+
+Runs `python -X importtime` on the app entry modules in a fresh interpreter,
+prints the slowest imports and exits non-zero if the cumulative import time
+goes over budget or if a heavy backend is loaded at startup.
+
+    python benchmarks/bench_startup.py [--budget-ms 400] [--module agent_orchestrator]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Backends that must only be imported by the reader/writer that needs them
+HEAVY_MODULES = ("transformers", "torch", "pandas", "pdfminer", "reportlab", "pptx", "docx")
+
+DEFAULT_BUDGET_MS = 400
+DEFAULT_MODULES = ("agent_orchestrator", "app")
+
+
+def measure(module, runs=3):
+    """Returns (best cumulative ms, importtime rows of the best run, heavy modules loaded)."""
+    probe = (f"import sys, {module}; "
+             f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", probe],
+                              cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+        rows = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+        total_ms = sum(r[0] for r in rows) / 1000
+        if best is None or total_ms < best[0]:
+            heavy = [m for m in proc.stdout.strip().split(",") if m]
+            best = (total_ms, rows, heavy)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.getenv("IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS)))
+    parser.add_argument("--module", action="append", dest="modules")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules or DEFAULT_MODULES:
+        try:
+            total_ms, rows, heavy = measure(module)
+        except RuntimeError as e:
+            print(f"⚠️ skipping {module}: {e}")
+            continue
+        status = "OK" if total_ms <= args.budget_ms and not heavy else "OVER BUDGET"
+        print(f"\n{module}: {total_ms:.1f} ms cold import (budget {args.budget_ms:.0f} ms) - {status}")
+        for self_us, cumulative_us, name in sorted(rows, key=lambda r: -r[0])[:args.top]:
+            print(f"  {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms cumulative  {name.strip()}")
+        if heavy:
+            print(f"  ❌ heavy backends loaded at startup: {', '.join(heavy)}")
+        failed |= status != "OK"
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
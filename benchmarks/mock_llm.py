@@ -0,0 +1,249 @@
+"""
+OpenAI/Groq-compatible stand-in for /v1/chat/completions, for benchmarks and
+offline runs. Answers with canned markdown documents, optionally after a
+fixed latency plus a per-token generation time, streams server-sent events
+when asked to, and can inject 429s with a Retry-After header. In JSON mode
+(response_format json_object) the document is answered as a slide deck.
+
+    python benchmarks/mock_llm.py [--port 8089] [--latency 0.2] [--tokens-per-second 400]
+                                  [--error-rate 0.05] [--responses DIR]
+
+Point the app at it with GROQ_API_URL=http://127.0.0.1:8089/v1/chat/completions.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STREAM_FRAGMENT_CHARS = 16   # characters per streamed delta
+CHARS_PER_TOKEN = 4
+
+DEFAULT_RESPONSES = [
+    "# Solar Energy Outlook\n\n"
+    "Solar capacity keeps growing as module prices fall and storage matures.\n\n"
+    "## Key Findings\n\n"
+    "- Utility-scale installations lead new capacity additions.\n"
+    "- Storage attached to solar doubled year over year.\n"
+    "- Grid interconnection queues are the main bottleneck.\n\n"
+    "## Cost Breakdown\n\n"
+    "| Component | Share | Trend |\n|---|---|---|\n"
+    "| Modules | 35% | Falling |\n| Inverters | 10% | Flat |\n| Labour | 25% | Rising |\n| Permits | 30% | Flat |\n\n"
+    "### Outlook:\n\n"
+    "Output is expected to rise steadily while costs continue to decline.\n",
+
+    "# Quarterly Operations Review\n\n"
+    "## Summary\n\n"
+    "Throughput improved while incident counts stayed within targets.\n\n"
+    "## Metrics\n\n"
+    "- Availability: 99.95% against a 99.9% target.\n"
+    "- Median latency fell by 18% after the cache rollout.\n"
+    "- Support tickets per customer dropped for the third quarter in a row.\n\n"
+    "## Risks\n\n"
+    "1. Vendor lock-in for the message queue.\n"
+    "2. On-call load concentrated on two engineers.\n\n"
+    "## Next Steps\n\n"
+    "Capacity planning for the next quarter and a review of alert thresholds.\n",
+
+    "# Data Profile Report\n\n"
+    "The dataset covers daily readings from several regional sites.\n\n"
+    "## Columns\n\n"
+    "| Column | Type | Notes |\n|---|---|---|\n"
+    "| site | category | 12 distinct values |\n| reading | float | mean 41.7, std 9.3 |\n| date | date | two full years |\n\n"
+    "## Observations\n\n"
+    "- Readings peak in summer months across all sites.\n"
+    "- Two sites show gaps that line up with maintenance windows.\n\n"
+    "## Equation\n\n"
+    "$$ y = a x + b $$\n",
+]
+
+
+def markdown_to_deck(text):
+    """The JSON slide deck (see prompts.SLIDES_JSON_PROMPT) a canned markdown document stands for."""
+    deck = {"title": "", "slides": []}
+    slide = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("# ") and not deck["title"]:
+            deck["title"] = line[2:]
+        elif line.startswith("#"):
+            slide = {"title": line.lstrip("#").strip().rstrip(":"), "bullets": []}
+            deck["slides"].append(slide)
+        elif slide is None or not line:
+            continue
+        elif line.startswith("|"):
+            cells = [cell.strip() for cell in line.strip("|").split("|")]
+            if not all(set(cell) <= set("-: ") for cell in cells):
+                table = slide.setdefault("table", {"header": cells, "rows": []})
+                if table["header"] is not cells:
+                    table["rows"].append(cells)
+        else:
+            slide["bullets"].append(line.lstrip("-*0123456789. "))
+    return json.dumps(deck)
+
+
+class MockLLM:
+    """
+    In-process mock server. `latency` seconds pass before the first byte and
+    every completion token adds 1/`tokens_per_second`. A request is answered
+    with 429 (Retry-After: `retry_after`) with probability `error_rate`.
+    The response is picked from `responses` by a hash of the prompt, so the
+    same request always gets the same document; max_tokens truncates it
+    (finish_reason "length"), after any conversion to JSON.
+    """
+
+    def __init__(self, latency=0.0, tokens_per_second=0.0, error_rate=0.0, retry_after=0.1,
+                 responses=None, seed=0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.responses = responses or DEFAULT_RESPONSES
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'throttled': 0, 'streamed': 0, 'completion_tokens': 0}
+        self.server = None
+
+    def start(self, host="127.0.0.1", port=0):
+        """Serves in a daemon thread; returns the chat-completions URL."""
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="mock-llm", daemon=True).start()
+        return f"http://{host}:{self.server.server_address[1]}/v1/chat/completions"
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def _count(self, **fields):
+        with self.lock:
+            for field, value in fields.items():
+                self.stats[field] += value
+
+    def _throttle(self):
+        with self.lock:
+            return self.error_rate > 0 and self.random.random() < self.error_rate
+
+    def completion(self, payload):
+        prompt = "".join(message.get("content", "") for message in payload.get("messages", []))
+        digest = hashlib.sha1(prompt.encode('utf-8')).digest()
+        text = self.responses[digest[0] % len(self.responses)]
+        if (payload.get("response_format") or {}).get("type") == "json_object":
+            text = markdown_to_deck(text)
+        finish_reason = "stop"
+        if payload.get("max_tokens") and len(text) > payload["max_tokens"] * CHARS_PER_TOKEN:
+            text = text[:payload["max_tokens"] * CHARS_PER_TOKEN]
+            finish_reason = "length"
+        return text, len(prompt) // CHARS_PER_TOKEN, max(1, len(text) // CHARS_PER_TOKEN), finish_reason
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, body, headers=()):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def write_chunk(self, data):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                mock._count(requests=1)
+                if mock._throttle():
+                    mock._count(throttled=1)
+                    self.send_json(429, {"error": {"message": "Rate limit reached", "type": "tokens"}},
+                                   [("Retry-After", str(mock.retry_after))])
+                    return
+                text, prompt_tokens, completion_tokens, finish_reason = mock.completion(payload)
+                mock._count(completion_tokens=completion_tokens)
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                         "total_tokens": prompt_tokens + completion_tokens}
+                per_token = 1.0 / mock.tokens_per_second if mock.tokens_per_second else 0.0
+                if mock.latency:
+                    time.sleep(mock.latency)
+                if not payload.get("stream"):
+                    if per_token:
+                        time.sleep(per_token * completion_tokens)
+                    self.send_json(200, {"id": "mock", "object": "chat.completion", "model": payload.get("model"),
+                                         "choices": [{"index": 0, "finish_reason": finish_reason,
+                                                      "message": {"role": "assistant", "content": text}}],
+                                         "usage": usage})
+                    return
+
+                mock._count(streamed=1)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(0, len(text), STREAM_FRAGMENT_CHARS):
+                    if per_token:
+                        time.sleep(per_token * STREAM_FRAGMENT_CHARS / CHARS_PER_TOKEN)
+                    delta = {"choices": [{"index": 0, "delta": {"content": text[i:i + STREAM_FRAGMENT_CHARS]}}]}
+                    self.write_chunk(f"data: {json.dumps(delta)}\n\n".encode('utf-8'))
+                # Groq reports usage on the last event under x_groq
+                final = {"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+                         "x_groq": {"usage": usage}}
+                self.write_chunk(f"data: {json.dumps(final)}\n\n".encode('utf-8'))
+                self.write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+def load_responses(directory):
+    """Canned responses from every *.md file in `directory`, in name order."""
+    responses = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.md"))):
+        with open(path, encoding='utf-8') as f:
+            responses.append(f.read())
+    if not responses:
+        raise SystemExit(f"No .md responses found in {directory}")
+    return responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first byte")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="generation speed (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--responses", help="directory of canned .md responses")
+    args = parser.parse_args()
+
+    mock = MockLLM(args.latency, args.tokens_per_second, args.error_rate, args.retry_after,
+                   load_responses(args.responses) if args.responses else None)
+    url = mock.start(args.host, args.port)
+    print(f"mock LLM listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+        print(mock.snapshot())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Rows per block; peak memory is one block plus the fixed-size sketches below
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "50000"))
+# Values kept per numeric column for quantiles (exact up to this many rows)
+QUANTILE_SAMPLE_SIZE = int(os.getenv("QUANTILE_SAMPLE_SIZE", "20000"))
+# Hashes kept per column for the distinct count (exact up to this many values)
+DISTINCT_SKETCH_SIZE = int(os.getenv("DISTINCT_SKETCH_SIZE", "4096"))
+# Candidate values tracked per column for top/freq
+TOP_K_CAPACITY = int(os.getenv("TOP_K_CAPACITY", "1024"))
+TOP_CATEGORIES_SHOWN = 3
+
+PERCENTILES = (0.25, 0.5, 0.75)
+
+
+# === Sketches ===
+
+class QuantileSample:
+    """
+    Uniform sample of at most `size` values (bottom-k on random keys), so
+    quantiles are exact for short columns and approximate for long ones.
+    """
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.empty(0)
+        self.values = np.empty(0)
+        self.seen = 0
+
+    def update(self, values):
+        self.seen += len(values)
+        keys = np.concatenate((self.keys, self.rng.random(len(values))))
+        values = np.concatenate((self.values, values))
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size)[:self.size]
+            keys, values = keys[keep], values[keep]
+        self.keys, self.values = keys, values
+
+    @property
+    def exact(self):
+        return self.seen <= self.size
+
+    def quantiles(self, qs):
+        if not len(self.values):
+            return [np.nan] * len(qs)
+        return list(np.quantile(self.values, qs))
+
+
+class DistinctSketch:
+    """K-minimum-values distinct counter: exact below `size` distinct values."""
+
+    def __init__(self, size):
+        self.size = size
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def update(self, values):
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        hashes = np.unique(np.concatenate((self.hashes, hashes)))
+        self.hashes = hashes[:self.size]
+
+    @property
+    def exact(self):
+        return len(self.hashes) < self.size
+
+    def count(self):
+        if self.exact:
+            return len(self.hashes)
+        # (k - 1) / (k-th smallest hash scaled to [0, 1))
+        return int(round((self.size - 1) / (float(self.hashes[-1]) / 2.0 ** 64)))
+
+
+class TopK:
+    """Frequent values, merged block by block and trimmed to `capacity` candidates."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='int64')
+        self.trimmed = False
+
+    def update(self, values):
+        counts = self.counts.add(values.value_counts(sort=False), fill_value=0)
+        if len(counts) > self.capacity:
+            counts = counts.nlargest(self.capacity)
+            self.trimmed = True
+        self.counts = counts.astype('int64')
+
+    def most_common(self, n):
+        # Stable sort keeps the first-seen value on ties, like value_counts
+        return list(self.counts.sort_values(ascending=False, kind='stable').head(n).items())
+
+
+# === Column Profiles ===
+
+class ColumnProfile:
+    """
+    Running statistics for one column read as strings. The column is treated
+    as numeric (like pandas' dtype inference) until a non-null value fails to
+    parse; categorical stats are kept all along so the switch costs nothing.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.nulls = 0
+        self.numeric = True
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+        self.sample = QuantileSample(QUANTILE_SAMPLE_SIZE)
+        self.distinct = DistinctSketch(DISTINCT_SKETCH_SIZE)
+        self.top = TopK(TOP_K_CAPACITY)
+
+    def update(self, column):
+        self.rows += len(column)
+        values = column.dropna()
+        self.nulls += len(column) - len(values)
+        if values.empty:
+            return
+        self.distinct.update(values)
+        self.top.update(values)
+        if self.numeric:
+            numbers = pd.to_numeric(values, errors='coerce')
+            if numbers.isna().any():
+                self.numeric = False
+            else:
+                self._update_moments(numbers.to_numpy(dtype='float64'))
+
+    def _update_moments(self, x):
+        # Chan et al. pairwise update of count / mean / sum of squared deviations
+        n_b = len(x)
+        mean_b = x.mean()
+        m2_b = ((x - mean_b) ** 2).sum()
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * self.n * n_b / n
+        self.n = n
+        self.min = np.fmin(self.min, x.min())
+        self.max = np.fmax(self.max, x.max())
+        self.sample.update(x)
+
+    def describe(self):
+        """Same rows and dtype as this column's part of DataFrame.describe(include='all')."""
+        if self.numeric:
+            std = np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+            mean = self.mean if self.n else np.nan
+            labels = ['count', 'mean', 'std', 'min'] + [f"{q:.0%}" for q in PERCENTILES] + ['max']
+            stats = [self.n, mean, std, self.min, *self.sample.quantiles(PERCENTILES), self.max]
+            return pd.Series(stats, index=labels, name=self.name, dtype='float64')
+        common = self.top.most_common(1)
+        top, freq = common[0] if common else (np.nan, np.nan)
+        return pd.Series([self.rows - self.nulls, self.distinct.count(), top, freq],
+                         index=['count', 'unique', 'top', 'freq'], name=self.name, dtype='object')
+
+
+# === Profiler ===
+
+class CsvProfiler:
+    """Feeds a CSV through ColumnProfiles in fixed-size blocks of string columns."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.profiles = [ColumnProfile(name) for name in self.columns]
+
+    def update(self, block):
+        for profile, (_, column) in zip(self.profiles, block.items()):
+            profile.update(column)
+
+    def describe(self):
+        descriptions = [profile.describe() for profile in self.profiles]
+        # Row order as in pandas: shortest index first, then new labels as they appear
+        names = []
+        for index in sorted((d.index for d in descriptions), key=len):
+            names.extend(name for name in index if name not in names)
+        return pd.concat([d.reindex(names) for d in descriptions], axis=1, sort=False)
+
+    def null_counts(self):
+        return {profile.name: profile.nulls for profile in self.profiles}
+
+    def approximations(self):
+        notes = []
+        if any(p.numeric and not p.sample.exact for p in self.profiles):
+            notes.append(f"percentiles estimated from a {QUANTILE_SAMPLE_SIZE}-row sample")
+        if any(not p.numeric and not p.distinct.exact for p in self.profiles):
+            notes.append(f"unique counts above {DISTINCT_SKETCH_SIZE} are estimates")
+        if any(not p.numeric and p.top.trimmed for p in self.profiles):
+            notes.append("top/freq tracked over the most frequent candidates")
+        return notes
+
+
+def profile_csv(file_path, chunk_rows=None):
+    """
+    Profiles a CSV of any size in one streaming pass. Every column is read as
+    strings (explicit dtype, no per-block inference) and parsed to numbers
+    vectorized, so memory stays bounded by the block size and sketch sizes.
+    """
+    reader = pd.read_csv(file_path, dtype=str, chunksize=chunk_rows or CSV_CHUNK_ROWS)
+    profiler = None
+    for block in reader:
+        if profiler is None:
+            profiler = CsvProfiler(block.columns)
+        profiler.update(block)
+    if profiler is None:
+        profiler = CsvProfiler(pd.read_csv(file_path, nrows=0).columns)
+    return profiler
+
+
+def summarize_csv(file_path):
+    """The read_csv prompt summary: describe() table, columns, missing values and top categories."""
+    profiler = profile_csv(file_path)
+    summary = profiler.describe().to_string()
+    columns = ", ".join(profiler.columns)
+    missing_report = "\n".join([f"{col}: {count} missing" for col, count in profiler.null_counts().items() if count > 0])
+    # Only columns with repeated values; for all-distinct columns the list is noise
+    top_report = "\n".join(
+        f"{p.name}: " + ", ".join(f"{value} ({count})" for value, count in p.top.most_common(TOP_CATEGORIES_SHOWN))
+        for p in profiler.profiles if not p.numeric and p.top.most_common(1)[0][1] > 1
+    )
+    notes = profiler.approximations()
+    return (f"📊 CSV Summary:\n\n{summary}\n\nColumns: {columns}"
+            + (f"\n\nMissing Values:\n{missing_report}" if missing_report else "")
+            + (f"\n\nTop Categories:\n{top_report}" if top_report else "")
+            + (f"\n\nNote: {'; '.join(notes)}." if notes else ""))
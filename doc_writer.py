@@ -1,46 +1,66 @@
 import os
 import re
 from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
 from docx.shared import Pt, RGBColor, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import nsdecls, qn
+from markdown_ir import Bullet, Equation, Heading, Paragraph, Table, iter_block_nodes, parse_markdown
+from ooxml import xml_text
 
 TITLE_COLOR = RGBColor(0, 32, 91)       # #00205b
 BODY_COLOR = RGBColor(0, 0, 0)          # Black body text
 SUBSUBHEADING_COLOR = BODY_COLOR        # Black for sub-subheadings
 FOOTER_COLOR = RGBColor(0xE4, 0x00, 0x2B)  # #e4002b red
 
+# Named styles: (name, base style, size, bold, color, space after, alignment).
+# Formatting lives in styles.xml once; paragraphs only reference a style id.
+PARAGRAPH_STYLES = {
+    'title': ("HP Title", None, 16, True, TITLE_COLOR, 12, WD_ALIGN_PARAGRAPH.CENTER),
+    'h1': ("HP Heading 1", None, 16, True, TITLE_COLOR, 12, WD_ALIGN_PARAGRAPH.LEFT),
+    'h2': ("HP Heading 2", None, 14, True, TITLE_COLOR, 8, WD_ALIGN_PARAGRAPH.LEFT),
+    'h3': ("HP Heading 3", None, 12, True, SUBSUBHEADING_COLOR, 6, WD_ALIGN_PARAGRAPH.LEFT),
+    'body': ("HP Body", None, 12, False, BODY_COLOR, 6, WD_ALIGN_PARAGRAPH.LEFT),
+    'bullet': ("HP Bullet", 'List Bullet', 12, False, BODY_COLOR, 4, WD_ALIGN_PARAGRAPH.LEFT),
+    'table_header': ("HP Table Header", None, 10, True, BODY_COLOR, 0, WD_ALIGN_PARAGRAPH.LEFT),
+    'table_cell': ("HP Table Cell", None, 10, False, BODY_COLOR, 0, WD_ALIGN_PARAGRAPH.LEFT),
+}
+FOOTER_STYLE = "HP Footer"
+HEADING_STYLES = {1: 'h1', 2: 'h2'}
+
+TABLE_WIDTH_TWIPS = 9360          # 6.5 inches of text width
+BATCH_SIZE = 256                  # nodes parsed into the body per lxml batch
+
 def generate_docx(body, output_path, title="Generated Document"):
+    """`body` is markdown text or IR nodes already produced by parse_markdown."""
+    nodes = parse_markdown(body) if isinstance(body, str) else body
+    write_docx_nodes(nodes, output_path, title)
+
+def generate_docx_stream(blocks, output_path, title="Generated Document"):
+    """Renders markdown sections as they arrive from the LLM stream."""
+    write_docx_nodes(iter_block_nodes(blocks), output_path, title)
+
+def write_docx_nodes(nodes, output_path, title):
     doc = Document()
+    style_ids = add_styles(doc)
+
+    # The body is built as XML text and parsed into lxml elements a batch at
+    # a time, instead of one python-docx paragraph and run per line
+    sectPr = doc.element.body.find(qn('w:sectPr'))
+    batch = []
 
     # Clean title of hashes and unwanted chars and print centered once
     clean_title = re.sub(r'^[#*\-_=\s]+|[#*\-_=\s]+$', '', title).strip()
     if clean_title:
-        para = doc.add_paragraph()
-        run = para.add_run(clean_title)
-        run.font.size = Pt(16)
-        run.font.bold = True
-        run.font.color.rgb = TITLE_COLOR
-        para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        para.space_after = Pt(12)
-
-    body_clean = clean_text(body)
-    sections = parse_sections(body_clean)
-
-    for sec in sections:
-        level = sec['level']
-        heading = sec['heading']
-        content = sec['body']
-
-        if level == 1:
-            add_heading(doc, heading, font_size=16, font_color=TITLE_COLOR)
-        elif level == 2:
-            add_heading(doc, heading, font_size=14, font_color=TITLE_COLOR)
-        elif level == 3:
-            add_heading(doc, heading, font_size=12, font_color=SUBSUBHEADING_COLOR)
-
-        add_body_content(doc, content)
+        batch.append(paragraph_xml(style_ids['title'], clean_title))
+
+    for node in nodes:
+        batch.append(node_xml(node, style_ids))
+        if len(batch) >= BATCH_SIZE:
+            flush_batch(sectPr, batch)
+            batch = []
+    flush_batch(sectPr, batch)
 
     add_footer(doc)
 
@@ -48,97 +68,74 @@ def generate_docx(body, output_path, title="Generated Document"):
     doc.save(output_path)
     print(f"📝 DOCX saved to: {output_path}")
 
-def clean_text(text):
-    lines = text.splitlines()
-    cleaned_lines = []
-    in_table = False
-    for line in lines:
-        stripped = line.strip()
-
-        # Preserve tables intact
-        if stripped.startswith('|') and stripped.endswith('|'):
-            in_table = True
-            cleaned_lines.append(line)
-            continue
-        elif in_table and stripped == '':
-            in_table = False
-            cleaned_lines.append(line)
-            continue
-        elif in_table:
-            cleaned_lines.append(line)
-            continue
-
-        # Keep heading hashes (#, ##, ###) only at line start, cleaning their content
-        heading_match = re.match(r'^(#{1,3})\s+(.*)$', line)
-        if heading_match:
-            hashes = heading_match.group(1)
-            content = heading_match.group(2)
-            content = re.sub(r'[*=_\-\s]+$', '', content)  # strip trailing decorations
-            content = re.sub(r'[*_]+', '', content)       # remove * and _ inside heading text
-            cleaned_lines.append(f"{hashes} {content.strip()}")
-            continue
-
-        # Remove lines of repeated markdown chars used as separators
-        if re.match(r'^[=\-_*]{3,}$', stripped):
-            continue
-
-        # Remove stray * and _ in other lines
-        clean_line = re.sub(r'[*_]+', '', line)
-        cleaned_lines.append(clean_line)
-
-    return "\n".join(cleaned_lines)
-
-def parse_sections(text):
-    pattern = re.compile(r'^(#{1,3})\s+(.*)$', re.MULTILINE)
-    matches = list(pattern.finditer(text))
-    if not matches:
-        return [{'level': 0, 'heading': '', 'body': text.strip()}]
-
-    sections = []
-
-    # Text before first heading
-    if matches[0].start() > 0:
-        pre_content = text[:matches[0].start()].strip()
-        if pre_content:
-            sections.append({'level': 0, 'heading': '', 'body': pre_content})
-
-    for i, match in enumerate(matches):
-        level = len(match.group(1))
-        heading = match.group(2).strip()
-        start = match.end()
-        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
-        body = text[start:end].strip()
-        sections.append({'level': level, 'heading': heading, 'body': body})
-
-    return sections
-
-def add_heading(doc, text, font_size, font_color):
-    para = doc.add_paragraph()
-    run = para.add_run(text)
-    run.font.size = Pt(font_size)
-    run.font.bold = True
-    run.font.color.rgb = font_color
-    para.alignment = WD_ALIGN_PARAGRAPH.LEFT
-    para.space_after = Pt({16:12, 14:8, 12:6}[font_size])
-
-def add_body_content(doc, content):
-    for line in content.splitlines():
-        l = line.strip()
-        if not l:
-            continue
-        if re.match(r'^[-+•]\s+', l):
-            para = doc.add_paragraph(style='List Bullet')
-            run = para.add_run(re.sub(r'^[-+•]\s+', '', l))
-            run.font.size = Pt(12)
-            run.font.color.rgb = BODY_COLOR
-            para.space_after = Pt(4)
-        else:
-            para = doc.add_paragraph()
-            run = para.add_run(l)
-            run.font.size = Pt(12)
-            run.font.color.rgb = BODY_COLOR
-            para.space_after = Pt(6)
-        para.alignment = WD_ALIGN_PARAGRAPH.LEFT
+def add_styles(doc):
+    """Defines the named styles once and returns their ids by role."""
+    styles = doc.styles
+    style_ids = {}
+    for role, (name, base, size, bold, color, space_after, alignment) in PARAGRAPH_STYLES.items():
+        style = styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+        style.base_style = styles[base] if base else styles['Normal']
+        style.font.size = Pt(size)
+        style.font.bold = bold
+        style.font.color.rgb = color
+        style.paragraph_format.space_after = Pt(space_after)
+        style.paragraph_format.alignment = alignment
+        style_ids[role] = style.style_id
+
+    footer = styles.add_style(FOOTER_STYLE, WD_STYLE_TYPE.CHARACTER)
+    footer.font.size = Pt(10)
+    footer.font.bold = True
+    footer.font.color.rgb = FOOTER_COLOR
+    return style_ids
+
+# === Body XML ===
+
+def paragraph_xml(style_id, text):
+    return (f'<w:p><w:pPr><w:pStyle w:val="{style_id}"/></w:pPr>'
+            f'<w:r><w:t xml:space="preserve">{xml_text(text)}</w:t></w:r></w:p>')
+
+def table_xml(node, style_ids):
+    rows = node.rows()
+    if not rows:
+        return ""
+    columns = max(len(row) for row in rows)
+    width = TABLE_WIDTH_TWIPS // columns
+    parts = ['<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/>'
+             f'<w:tblW w:w="{width * columns}" w:type="dxa"/><w:tblLook w:val="04A0" w:firstRow="1"/></w:tblPr>'
+             '<w:tblGrid>', f'<w:gridCol w:w="{width}"/>' * columns, '</w:tblGrid>']
+    for r, row in enumerate(rows):
+        # The header row repeats on every page the table spans
+        parts.append('<w:tr><w:trPr><w:tblHeader/></w:trPr>' if r == 0 else '<w:tr>')
+        style_id = style_ids['table_header' if r == 0 else 'table_cell']
+        for text in row + [''] * (columns - len(row)):
+            parts.append(f'<w:tc><w:tcPr><w:tcW w:w="{width}" w:type="dxa"/></w:tcPr>'
+                         f'{paragraph_xml(style_id, text)}</w:tc>')
+        parts.append('</w:tr>')
+    parts.append('</w:tbl>')
+    # Word needs a paragraph between two adjacent tables
+    parts.append('<w:p/>')
+    return "".join(parts)
+
+def node_xml(node, style_ids):
+    kind = type(node)
+    if kind is Heading:
+        return paragraph_xml(style_ids[HEADING_STYLES.get(node.level, 'h3')], node.text)
+    if kind is Bullet:
+        return paragraph_xml(style_ids['bullet'], node.text)
+    if kind is Paragraph:
+        return paragraph_xml(style_ids['body'], node.text)
+    if kind is Table:
+        return table_xml(node, style_ids)
+    if kind is Equation:
+        return "".join(paragraph_xml(style_ids['body'], line) for line in node.lines)
+    return ""   # Spacers: paragraph spacing comes from the styles
+
+def flush_batch(sectPr, batch):
+    if not batch:
+        return
+    fragment = parse_xml(f'<w:body {nsdecls("w")}>{"".join(batch)}</w:body>')
+    for element in list(fragment):
+        sectPr.addprevious(element)
 
 def add_footer(doc):
     section = doc.sections[0]
@@ -148,14 +145,11 @@ def add_footer(doc):
     while para.runs:
         para.runs[0].clear()
 
-    run_left = para.add_run("HPGPT")
-    run_left.font.size = Pt(10)
-    run_left.font.bold = True
-    run_left.font.color.rgb = FOOTER_COLOR
+    para.add_run("HPGPT", style=FOOTER_STYLE)
 
     para.add_run("\t")
 
-    run_page = para.add_run()
+    run_page = para.add_run(style=FOOTER_STYLE)
     fldChar_begin = OxmlElement('w:fldChar')
     fldChar_begin.set(qn('w:fldCharType'), 'begin')
     instrText = OxmlElement('w:instrText')
@@ -171,10 +165,6 @@ def add_footer(doc):
     run_page._r.append(fldChar_separate)
     run_page._r.append(fldChar_end)
 
-    run_page.font.size = Pt(10)
-    run_page.font.bold = True
-    run_page.font.color.rgb = FOOTER_COLOR
-
     para.paragraph_format.tab_stops.clear_all()
     para.paragraph_format.tab_stops.add_tab_stop(Inches(6.5), WD_ALIGN_PARAGRAPH.RIGHT)
     para.alignment = WD_ALIGN_PARAGRAPH.LEFT
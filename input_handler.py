@@ -1,11 +1,41 @@
+import hashlib
+import io
+import itertools
 import os
-import pandas as pd
-from transformers import BlipProcessor, BlipForConditionalGeneration
-from pdfminer.high_level import extract_text
+from collections import deque
 from dotenv import load_dotenv
 
+from artifact_store import text_cache
+from pools import POOL_WORKERS, get_process_pool
+
+# pandas (via csv_profiler) and pdfminer are imported inside the readers that need them so that
+# importing this module (and the Flask app) stays cheap.
+
 load_dotenv()
 
+# Page ranges one request keeps in flight on the shared process pool
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(POOL_WORKERS)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+PAGE_BREAK = "\f"  # separates pages in cached text; pdfminer ends every page with one
+
+# === Extracted Text Cache ===
+
+def file_cache_key(file_path):
+    """sha256 of the contents plus mtime, for files that are not content-addressed uploads."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return f"{digest.hexdigest()}-{os.stat(file_path).st_mtime_ns}"
+
+def text_cache_name(file_path, ext, cache_key=None):
+    """Name of a file's extracted text (PDF pages, CSV summary) in artifact_store.text_cache."""
+    return f"{cache_key or file_cache_key(file_path)}{ext}.txt"
+
+def write_cached_text(name, file_path, text):
+    text_cache.put(name, text, os.path.basename(file_path), 'txt')
+
+
 # === Text Reader ===
 def read_txt(file_path):
     with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
@@ -13,24 +43,106 @@ def read_txt(file_path):
 
 
 # === Improved PDF Reader (pdfminer) ===
-def read_pdf(file_path):
+
+def count_pdf_pages(file_path):
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+    with open(file_path, 'rb') as fp:
+        document = PDFDocument(PDFParser(fp))
+        try:
+            return int(resolve1(document.catalog['Pages'])['Count'])
+        except (KeyError, TypeError, ValueError):
+            # Broken page tree: fall back to walking it
+            return sum(1 for _ in PDFPage.create_pages(document))
+
+def extract_page_range(file_path, start, stop):
+    """Text of pages [start, stop), one string per page. Runs in the process pool workers."""
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+
+    output = io.StringIO()
+    resources = PDFResourceManager(caching=True)
+    device = TextConverter(resources, output, laparams=LAParams())
+    interpreter = PDFPageInterpreter(resources, device)
+    pages = []
+    with open(file_path, 'rb') as fp:
+        for page in PDFPage.get_pages(fp, pagenos=range(start, stop)):
+            interpreter.process_page(page)
+            pages.append(output.getvalue().rstrip(PAGE_BREAK))
+            output.seek(0)
+            output.truncate()
+    device.close()
+    return pages
+
+def iter_pdf_pages(file_path, workers=None, use_cache=True, cache_key=None):
+    """
+    Yields the text of each page in order. Page ranges are extracted in
+    parallel by the shared process pool, with only a few ranges in flight ahead
+    of the consumer, so chunking can start on page one while later pages are
+    still being parsed. Extracted text is cached under `cache_key` (the
+    upload's content hash), or the file hash and mtime when none is given.
+    """
+    cache_name = text_cache_name(file_path, '.pdf', cache_key) if use_cache else None
+    cache_path = cache_name and text_cache.lookup(cache_name)
+    if cache_path:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            yield from f.read().split(PAGE_BREAK)
+        return
+
+    page_count = count_pdf_pages(file_path)
+    step = PDF_PAGES_PER_TASK
+    ranges = ((start, min(start + step, page_count)) for start in range(0, page_count, step))
+    workers = max(1, workers or PDF_WORKERS)
+    extracted = []
+
+    if page_count <= step or workers == 1:
+        # Not worth a round trip to the pool
+        for start, stop in ranges:
+            for page in extract_page_range(file_path, start, stop):
+                extracted.append(page)
+                yield page
+    else:
+        pool = get_process_pool()
+        pending = deque(pool.submit(extract_page_range, file_path, start, stop)
+                        for start, stop in itertools.islice(ranges, workers * 2))
+        while pending:
+            pages = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range:
+                pending.append(pool.submit(extract_page_range, file_path, *next_range))
+            for page in pages:
+                extracted.append(page)
+                yield page
+
+    if cache_name:
+        write_cached_text(cache_name, file_path, PAGE_BREAK.join(extracted))
+
+def iter_pdf_text(file_path, cache_key=None):
+    """iter_pdf_pages with read_pdf's messages for failed or image-only PDFs."""
+    found = False
     try:
-        text = extract_text(file_path)
-        if not text.strip():
-            return "⚠️ No readable text found in PDF. It might be scanned or image-based."
-        return text.strip()
+        for page in iter_pdf_pages(file_path, cache_key=cache_key):
+            found = found or bool(page.strip())
+            yield page
     except Exception as e:
-        return f"❌ Failed to extract text from PDF: {str(e)}"
+        yield f"❌ Failed to extract text from PDF: {str(e)}"
+        return
+    if not found:
+        yield "⚠️ No readable text found in PDF. It might be scanned or image-based."
+
+def read_pdf(file_path):
+    return "".join(iter_pdf_text(file_path)).strip()
 
 
 # === CSV Analyzer ===
 def read_csv(file_path):
-    df = pd.read_csv(file_path)
-    summary = df.describe(include='all').to_string()
-    columns = ", ".join(df.columns)
-    missing = df.isnull().sum()
-    missing_report = "\n".join([f"{col}: {count} missing" for col, count in missing.items() if count > 0])
-    return f"📊 CSV Summary:\n\n{summary}\n\nColumns: {columns}" + (f"\n\nMissing Values:\n{missing_report}" if missing_report else "")
+    # Streams the file in blocks; see csv_profiler for the statistics kept
+    from csv_profiler import summarize_csv
+    return summarize_csv(file_path)
 
 
 # === Input Handler ===
@@ -83,3 +195,22 @@ def parse_file_only(file_path, file_ext):
         return read_csv(file_path)
     else:
         raise ValueError(f"Unsupported file extension: {ext}")
+
+def iter_file_text(file_path, file_ext, cache_key=None):
+    """
+    Like parse_file_only, but PDFs are yielded page by page as they are
+    extracted. PDF text and CSV summaries are cached under `cache_key`.
+    """
+    ext = file_ext.lower()
+    if ext == ".pdf":
+        return iter_pdf_text(file_path, cache_key)
+    if ext == ".csv":
+        cache_name = text_cache_name(file_path, ext, cache_key)
+        cache_path = text_cache.lookup(cache_name)
+        if cache_path:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return iter((f.read(),))
+        summary = read_csv(file_path)
+        write_cached_text(cache_name, file_path, summary)
+        return iter((summary,))
+    return iter((parse_file_only(file_path, ext),))
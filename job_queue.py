@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+
+import metrics
+
+JOBS_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'jobs.sqlite3')
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+POLL_INTERVAL = 1.0  # seconds; also picks up jobs queued by other processes
+# A running job's lease is renewed every JOB_LEASE_SECONDS / 3 while its worker
+# lives; once it lapses the job is queued again
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# A job whose worker died this many times (OOM, native crash, hang) is failed
+# instead of being claimed again
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+# === SQLite-Backed Job Queue ===
+
+class JobQueue:
+    """
+    Durable job queue with a pool of worker threads. Jobs survive restarts:
+    queued jobs are picked up again, and a running job holds a lease that a
+    heartbeat thread keeps renewing, so jobs whose worker process died are
+    re-queued once it expires, up to JOB_MAX_ATTEMPTS claims in all. Claiming
+    is a single IMMEDIATE transaction, so several processes can share one
+    database.
+
+    `handler(job_id, params, progress)` does the work and returns the output path;
+    `progress(stage, chunks_done, chunks_total)` records where the job is.
+    Each job runs inside a metrics trace; its per-stage timing breakdown is
+    stored as JSON in `timings` when the job finishes or fails.
+    """
+
+    def __init__(self, handler, path=JOBS_DB_PATH, workers=JOB_WORKERS):
+        self.handler = handler
+        self.path = path
+        self.workers = workers
+        self.wakeup = threading.Event()
+        self.threads = []
+        self.start_lock = threading.Lock()
+        self.running = set()   # ids of the jobs this process is working on
+        self.running_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT NOT NULL,"
+                " chunks_done INTEGER NOT NULL DEFAULT 0, chunks_total INTEGER NOT NULL DEFAULT 0,"
+                " params TEXT NOT NULL, output_path TEXT, error TEXT, worker_pid INTEGER,"
+                " created REAL NOT NULL, updated REAL NOT NULL, timings TEXT, lease_until REAL,"
+                " attempts INTEGER NOT NULL DEFAULT 0)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created)")
+            # Databases created before timings, leases and attempts were recorded
+            columns = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+            for column in ('timings TEXT', 'lease_until REAL', 'attempts INTEGER NOT NULL DEFAULT 0'):
+                if column.split()[0] not in columns:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def start(self):
+        """Starts the workers once; later calls (e.g. one per request) return right away."""
+        if self.threads:
+            return
+        with self.start_lock:
+            if self.threads:
+                return
+            with self._connect() as db:
+                self._recover(db)
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _recover(self, db):
+        # Jobs claimed before leases existed have none and count as expired
+        now = time.time()
+        expired = "status = 'running' AND (lease_until IS NULL OR lease_until < ?)"
+        db.execute(f"UPDATE jobs SET status = 'failed', stage = 'failed', updated = ?, "
+                   f"error = 'Worker died ' || attempts || ' times while running this job.' "
+                   f"WHERE {expired} AND attempts >= ?", (now, now, JOB_MAX_ATTEMPTS))
+        db.execute(f"UPDATE jobs SET status = 'queued', stage = 'queued', updated = ? WHERE {expired}",
+                   (now, now))
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(JOB_LEASE_SECONDS / 3)
+            with self.running_lock:
+                job_ids = list(self.running)
+            if not job_ids:
+                continue
+            try:
+                with self._connect() as db:
+                    db.executemany("UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                                   ((time.time() + JOB_LEASE_SECONDS, job_id) for job_id in job_ids))
+            except sqlite3.Error:
+                traceback.print_exc()
+
+    def submit(self, **params):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT INTO jobs (id, status, stage, params, created, updated) "
+                       "VALUES (?, 'queued', 'queued', ?, ?, ?)", (job_id, json.dumps(params), now, now))
+        self.wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['timings'] = json.loads(job['timings']) if job['timings'] else None
+        return job
+
+    def update(self, job_id, **fields):
+        fields['updated'] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _claim(self):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            self._recover(db)
+            row = db.execute("SELECT id, params, created FROM jobs WHERE status = 'queued' "
+                             "ORDER BY created LIMIT 1").fetchone()
+            if row:
+                now = time.time()
+                db.execute("UPDATE jobs SET status = 'running', stage = 'starting', worker_pid = ?, "
+                           "updated = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                           (os.getpid(), now, now + JOB_LEASE_SECONDS, row[0]))
+                with self.running_lock:
+                    self.running.add(row[0])
+            db.execute("COMMIT")
+            return (row[0], json.loads(row[1]), row[2]) if row else None
+
+    def _work(self):
+        while True:
+            job = self._claim()
+            if job is None:
+                self.wakeup.wait(POLL_INTERVAL)
+                self.wakeup.clear()
+                continue
+            job_id, params, created = job
+
+            def progress(stage, done=0, total=0):
+                self.update(job_id, stage=stage, chunks_done=done, chunks_total=total)
+
+            with metrics.trace() as trace:
+                metrics.record('job.queued', max(0.0, time.time() - created))
+                try:
+                    with metrics.span('job'):
+                        output_path = self.handler(job_id, params, progress)
+                except Exception as e:
+                    traceback.print_exc()
+                    self.update(job_id, status='failed', stage='failed', error=str(e),
+                                timings=json.dumps(trace.summary()))
+                else:
+                    self.update(job_id, status='done', stage='done', output_path=output_path,
+                                timings=json.dumps(trace.summary()))
+                finally:
+                    with self.running_lock:
+                        self.running.discard(job_id)
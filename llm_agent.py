@@ -1,44 +1,194 @@
+import json
+import os
+import random
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from custom_secrets import GROQ_API_KEY  # securely imported API key
+from llm_cache import LLM_CACHE_DISABLED, make_cache_key, response_cache
+from metrics import count, span
+from prompts import DOCUMENT_PROMPT
+from rate_limiter import RateLimiter, parse_retry_after
+from text_chunker import estimate_tokens
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-
-def query_llama(prompt: str, model="llama3-70b-8192"):
-    enhanced_prompt = (
-        "You are an expert AI document generator.\n"
-        "Please format your output with proper markdown headings:\n"
-        "- Use '#' for main titles\n"
-        "- Use '##' for subheadings\n"
-        "- Use '###' for sub-subheadings\n"
-        "Avoid unnecessary special characters such as asterisks or hashes except for markdown headings.\n"
-        "Output a clean, readable document structure.\n"
-        "Generate a unique title for the documents and powerpoint presentations. Make sure to follow grammatical rules while doing so."
-        "The title for the powerpoint presentation should be generated just like the title for the word and pdf documents."
-        "When asked for a Word or PDF file, explain the topics in details. Everything should be well-explained."
-        "When asked for a Powerpoint presentation, give content in a proper point-wise format"
-        "Explain in about 100 words, the points properly in the ppt"
-        "The pointers for the Powerpoint presentations should be clear."
-        "Design tables as and when required."
-        "Give well formatted equations as and when required"
-        "\n"
-        + prompt
-    )
-    headers = {
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+
+# Per-key budget shared by every caller in this process
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000"))
+
+# HTTP client settings
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "120"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "4"))
+GROQ_BACKOFF_BASE = 1.0   # seconds, doubled on every retry
+GROQ_BACKOFF_CAP = 30.0
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+default_limiter = RateLimiter(GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE)
+
+
+class GroqAPIError(Exception):
+    """Raised when a Groq API call fails for good (non-retryable status or retries exhausted)."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# === Pooled HTTP Session ===
+
+def _build_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json",
-    }
+    })
+    return session
+
+# Keep-alive connections are reused across chunks, requests and threads
+session = _build_session()
+
+def _backoff_delay(attempt):
+    # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(GROQ_BACKOFF_CAP, GROQ_BACKOFF_BASE * (2 ** attempt)))
+
+def post_chat_completion(payload, limiter=None, stream=False):
+    """
+    POSTs a chat-completions payload with rate limiting and jittered exponential
+    backoff on 429/5xx and connection errors. Returns the successful response.
+    """
+    limiter = limiter or default_limiter
+    request_tokens = sum(estimate_tokens(m["content"]) for m in payload["messages"])
+    # Stages: llm.wait is time queued in the rate limiter, llm.http one round
+    # trip (up to the response headers when streaming)
+    with span('llm.request', tokens_in=request_tokens) as request_span:
+        for attempt in range(GROQ_MAX_RETRIES + 1):
+            with span('llm.wait'):
+                limiter.acquire(request_tokens)
+            try:
+                with span('llm.http'):
+                    response = session.post(GROQ_API_URL, json=payload, stream=stream,
+                                            timeout=(GROQ_CONNECT_TIMEOUT, GROQ_READ_TIMEOUT))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == GROQ_MAX_RETRIES:
+                    raise GroqAPIError(f"Groq API unreachable after {attempt + 1} attempts: {e}") from e
+                request_span.add(retries=1)
+                time.sleep(_backoff_delay(attempt))
+                continue
+
+            if response.ok:
+                return response
+            if response.status_code not in RETRYABLE_STATUS or attempt == GROQ_MAX_RETRIES:
+                raise GroqAPIError(f"Groq API error {response.status_code}: {response.text}",
+                                   status_code=response.status_code)
+            request_span.add(retries=1, throttled=int(response.status_code == 429))
+            if response.status_code == 429 and response.headers.get("Retry-After"):
+                # Block every worker sharing this limiter until the server says go
+                limiter.penalize(parse_retry_after(response.headers["Retry-After"]))
+            else:
+                time.sleep(_backoff_delay(attempt))
+            response.close()
+
+def usage_fields(usage):
+    """
+    Token accounting as reported by the API: prompt tokens billed, how many of
+    them were served from the provider's prompt cache, and completion tokens.
+    """
+    fields = {'tokens_prompt': usage.get("prompt_tokens", 0), 'tokens_out': usage.get("completion_tokens", 0)}
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+    if cached is not None:
+        fields['tokens_cached'] = cached
+    return fields
+
+def _iter_stream_tokens(response, limiter):
+    # Server-sent events: one "data: {json}" line per delta, terminated by "data: [DONE]"
+    response.encoding = response.encoding or "utf-8"
+    with response:
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                usage = event.get("usage") or event.get("x_groq", {}).get("usage")
+                if usage:
+                    limiter.debit(usage.get("completion_tokens", 0))
+                    count('llm.query', **usage_fields(usage))
+                for choice in event.get("choices", []):
+                    token = choice.get("delta", {}).get("content")
+                    if token:
+                        yield token
+        # Past the headers nothing is retried, but callers still get the typed error
+        except requests.exceptions.RequestException as e:
+            raise GroqAPIError(f"Groq API stream interrupted: {e}") from e
+        except ValueError as e:
+            raise GroqAPIError(f"Groq API sent a malformed stream event: {e}") from e
+
+def _cache_stream(fragments, key):
+    # Pass fragments through and store the full text once the stream completes
+    parts = []
+    for fragment in fragments:
+        parts.append(fragment)
+        yield fragment
+    response_cache.set(key, "".join(parts).strip())
+
+def query_llama(prompt: str, model="llama3-70b-8192", limiter=None, stream=False, use_cache=True,
+                template=DOCUMENT_PROMPT, max_tokens=None):
+    """
+    Returns the completion text, or with stream=True a generator of text
+    fragments as the model produces them. Identical requests are answered from
+    the response cache unless use_cache=False (or LLM_CACHE_DISABLED=1).
+    prompt is the user message, sent once after the template's static system
+    prefix (see prompts.PromptTemplate); template selects the instructions
+    (e.g. a format profile or the map-reduce notes passes) and max_tokens caps
+    the completion length. JSON templates switch the API to JSON mode; a JSON
+    reply cut off by max_tokens is requested again with twice the budget.
+    """
     payload = {
         "model": model,
-        "messages": [
-            {"role": "system", "content": enhanced_prompt},
-            {"role": "user", "content": prompt},
-        ],
+        "messages": template.messages(prompt),
         "temperature": 0.7,
     }
-    try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload)
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"].strip()
-    except requests.exceptions.RequestException as e:
-        return f"❌ Groq API error: {e} - {getattr(e.response, 'text', 'No response')}"
+    if max_tokens:
+        payload["max_tokens"] = max_tokens
+    if template.json:
+        payload["response_format"] = {"type": "json_object"}
+    use_cache = use_cache and not LLM_CACHE_DISABLED
+    with span('llm.query') as query_span:
+        if use_cache:
+            key = make_cache_key(model, template.cache_id, prompt, payload["temperature"], max_tokens)
+            cached = response_cache.get(key)
+            if cached is not None:
+                query_span.add(cache_hits=1)
+                return iter([cached]) if stream else cached
+            query_span.add(cache_misses=1)
 
+        # Estimated input sent, split into the shared instruction prefix and the request content
+        query_span.add(prefix_tokens=template.system_tokens, content_tokens=estimate_tokens(prompt))
+        limiter = limiter or default_limiter
+        if stream:
+            payload["stream"] = True
+            fragments = _iter_stream_tokens(post_chat_completion(payload, limiter, stream=True), limiter)
+            return _cache_stream(fragments, key) if use_cache else fragments
+        for attempt in range(2):
+            data = post_chat_completion(payload, limiter).json()
+            usage = data.get("usage", {})
+            limiter.debit(usage.get("completion_tokens", 0))
+            query_span.add(**usage_fields(usage))
+            choice = data["choices"][0]
+            # JSON cut off at max_tokens does not parse: ask once more with twice the budget
+            if attempt or not (template.json and max_tokens and choice.get("finish_reason") == "length"):
+                break
+            payload["max_tokens"] = 2 * max_tokens
+            query_span.add(truncated=1, prefix_tokens=template.system_tokens, content_tokens=estimate_tokens(prompt))
+        content = choice["message"]["content"].strip()
+        if use_cache:
+            response_cache.set(key, content)
+        return content
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+CACHE_DB_PATH = os.path.join(CACHE_DIR, 'llm_responses.sqlite3')
+
+LLM_CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLED", "0") == "1"
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+
+
+def make_cache_key(model, system_prompt, user_prompt, temperature, max_tokens=None):
+    """Content address of a chat completion request."""
+    fields = [model, system_prompt, user_prompt, temperature]
+    if max_tokens is not None:
+        fields.append(max_tokens)
+    raw = json.dumps(fields, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# === Two-Tier Response Cache ===
+
+class ResponseCache:
+    """
+    Bounded in-memory LRU in front of a SQLite store. Disk entries expire after
+    `ttl` seconds and the least recently used ones are evicted once the store
+    grows past `max_bytes`. Safe to share between threads.
+    """
+
+    def __init__(self, path=CACHE_DB_PATH, memory_entries=LLM_CACHE_MEMORY_ENTRIES,
+                 max_bytes=LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.memory = OrderedDict()   # key -> (value, created)
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses(created)")
+            # Running total of `size`, kept by triggers in the writing transaction,
+            # so eviction checks never scan the table
+            self._db.execute("CREATE TABLE IF NOT EXISTS store_size (id INTEGER PRIMARY KEY CHECK (id = 0),"
+                             " bytes INTEGER NOT NULL)")
+            self._db.execute("CREATE TRIGGER IF NOT EXISTS responses_size_insert AFTER INSERT ON responses "
+                             "BEGIN UPDATE store_size SET bytes = bytes + NEW.size; END")
+            self._db.execute("CREATE TRIGGER IF NOT EXISTS responses_size_update AFTER UPDATE OF size ON responses "
+                             "BEGIN UPDATE store_size SET bytes = bytes - OLD.size + NEW.size; END")
+            self._db.execute("CREATE TRIGGER IF NOT EXISTS responses_size_delete AFTER DELETE ON responses "
+                             "BEGIN UPDATE store_size SET bytes = bytes - OLD.size; END")
+            # Stores written before the total was kept are summed once
+            self._db.execute("INSERT OR IGNORE INTO store_size (id, bytes) "
+                             "SELECT 0, COALESCE(SUM(size), 0) FROM responses "
+                             "WHERE NOT EXISTS (SELECT 1 FROM store_size)")
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key, value, created):
+        self.memory[key] = (value, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+            self.memory.pop(key, None)
+
+            db = self._conn()
+            row = db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] < self.ttl:
+                db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                db.commit()
+                self._remember(key, row[0], row[1])
+                self.disk_hits += 1
+                return row[0]
+            if row:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                db.commit()
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        with self.lock:
+            self._remember(key, value, now)
+            db = self._conn()
+            # An upsert, not INSERT OR REPLACE: REPLACE deletes without firing the size triggers
+            db.execute("INSERT INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?) "
+                       "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                       "created = excluded.created, accessed = excluded.accessed",
+                       (key, value, size, now, now))
+            self._evict(db, now)
+            db.commit()
+
+    def _evict(self, db, now):
+        db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = db.execute("SELECT bytes FROM store_size").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used rows until the store fits again
+        freed = 0
+        victims = []
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if total - freed <= self.max_bytes:
+                break
+            victims.append((key,))
+            freed += size
+        db.executemany("DELETE FROM responses WHERE key = ?", victims)
+        for (key,) in victims:
+            self.memory.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            db = self._conn()
+            db.execute("DELETE FROM responses")
+            db.commit()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self.memory),
+            }
+
+
+# Shared by every request in this process
+response_cache = ResponseCache()
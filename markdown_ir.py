@@ -0,0 +1,178 @@
+import re
+
+# Compiled once; each is only tried when a cheap first-character check says it can match
+HEADING = re.compile(r'^(#{1,3})\s+(.*)$')
+HEADING_TRAILER = re.compile(r'[*=_\-\s]+$')
+EMPHASIS = re.compile(r'[*_]+')
+RULE = re.compile(r'^[=\-_*]{3,}$')
+BULLET = re.compile(r'^[-+•]\s+')
+TABLE_SEPARATOR = re.compile(r'^\|?[\s:|-]*-{3,}[\s:|-]*\|?$')
+
+
+# === Document IR ===
+
+class Heading:
+    __slots__ = ('level', 'text')
+
+    def __init__(self, level, text):
+        self.level = level
+        self.text = text
+
+class Paragraph:
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+class Bullet:
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+class Table:
+    """Raw pipe-table lines; `rows()` splits them into cells without the separator row."""
+    __slots__ = ('lines',)
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def rows(self):
+        rows = []
+        for line in self.lines:
+            if '|' not in line or TABLE_SEPARATOR.match(line):
+                continue
+            rows.append([cell.strip() for cell in line.strip().strip('|').split('|')])
+        return rows
+
+class Equation:
+    """A display equation ($$ ... $$ or \\[ ... \\]) kept verbatim, one entry per line."""
+    __slots__ = ('lines',)
+
+    def __init__(self, lines):
+        self.lines = lines
+
+class Spacer:
+    """Blank lines between two blocks of the same section."""
+    __slots__ = ('lines',)
+
+    def __init__(self, lines):
+        self.lines = lines
+
+def _node_repr(node):
+    fields = ", ".join(f"{name}={getattr(node, name)!r}" for name in node.__slots__)
+    return f"{type(node).__name__}({fields})"
+
+def _node_eq(node, other):
+    return type(node) is type(other) and all(getattr(node, n) == getattr(other, n) for n in node.__slots__)
+
+for _cls in (Heading, Paragraph, Bullet, Table, Equation, Spacer):
+    _cls.__repr__ = _node_repr
+    _cls.__eq__ = _node_eq
+
+
+# === Single-Pass Tokenizer ===
+
+def parse_markdown(text):
+    """
+    Cleans and tokenizes LLM markdown into a flat list of IR nodes in one pass:
+    - '#'..'###' headings with trailing decoration and emphasis removed
+    - pipe tables kept verbatim until the next blank line or heading
+    - $$ / \\[ display equations kept verbatim
+    - '-', '+', '•' bullets and plain paragraphs with stray '*' / '_' removed
+    - horizontal rules dropped; blank lines inside a section become Spacers
+    """
+    nodes = []
+    append = nodes.append
+    table = None
+    equation = None
+    equation_end = None
+    blanks = 0
+    in_section = False   # anything emitted since the last heading?
+
+    for line in text.splitlines():
+        stripped = line.strip()
+
+        if equation is not None:
+            equation.append(stripped)
+            if stripped.endswith(equation_end):
+                equation = None
+            continue
+
+        first = line[:1]
+        heading = HEADING.match(line) if first == '#' else None
+
+        if table is not None:
+            if stripped and not heading:
+                table.append(stripped)
+                continue
+            table = None
+
+        if heading:
+            content = HEADING_TRAILER.sub('', heading.group(2))
+            append(Heading(len(heading.group(1)), EMPHASIS.sub('', content).strip()))
+            blanks = 0
+            in_section = False
+            continue
+
+        if not stripped:
+            blanks += in_section
+            continue
+
+        lead = stripped[0]
+        if lead == '|' and stripped.endswith('|'):
+            table = [stripped]
+            node = Table(table)
+        elif lead == '$' and stripped.startswith('$$') or lead == '\\' and stripped.startswith('\\['):
+            equation_end = '$$' if lead == '$' else '\\]'
+            lines = [stripped]
+            if len(stripped) < 4 or not stripped.endswith(equation_end):
+                equation = lines
+            node = Equation(lines)
+        else:
+            if lead in '=-_*' and RULE.match(stripped):
+                continue
+            if '*' in stripped or '_' in stripped:
+                stripped = EMPHASIS.sub('', stripped).strip()
+                if not stripped:
+                    blanks += in_section
+                    continue
+            lead = stripped[0]
+            if lead in '-+•' and BULLET.match(stripped):
+                node = Bullet(BULLET.sub('', stripped, count=1))
+            else:
+                node = Paragraph(stripped)
+
+        if blanks:
+            append(Spacer(blanks))
+            blanks = 0
+        append(node)
+        in_section = True
+
+    return nodes
+
+
+def iter_block_nodes(blocks):
+    """IR nodes for a stream of markdown sections (see markdown_stream)."""
+    for block in blocks:
+        yield from parse_markdown(block)
+
+
+def group_sections(nodes):
+    """
+    Yields (heading, body_nodes) per section; heading is None for content
+    before the first heading. Works on lists and on streams of nodes.
+    """
+    heading = None
+    body = []
+    started = False
+    for node in nodes:
+        if type(node) is Heading:
+            if started:
+                yield heading, body
+            heading, body, started = node, [], True
+        else:
+            body.append(node)
+            started = True
+    if started:
+        yield heading, body
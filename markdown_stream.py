@@ -0,0 +1,58 @@
+import re
+
+HEADING_LINE = re.compile(r'^#{1,3}\s')
+
+
+# === Incremental Section Parser ===
+
+class SectionStreamParser:
+    """
+    Accepts LLM output in arbitrary fragments and hands back complete markdown
+    sections (heading line + body) as soon as the next heading shows they are
+    finished. Only the current line and the section in progress are buffered.
+    """
+
+    def __init__(self):
+        self.partial = []   # fragments of the line still being generated
+        self.lines = []     # finished lines of the section in progress
+
+    def feed(self, fragment):
+        """Adds a text fragment and returns the list of sections it completed."""
+        done = []
+        if "\n" not in fragment:
+            self.partial.append(fragment)
+            return done
+        head, *middle, tail = fragment.split("\n")
+        self.partial.append(head)
+        for line in ["".join(self.partial), *middle]:
+            self._add_line(line, done)
+        self.partial = [tail] if tail else []
+        return done
+
+    def close(self):
+        """Flushes the trailing line and the last section."""
+        done = []
+        if self.partial:
+            self._add_line("".join(self.partial), done)
+            self.partial = []
+        self._flush(done)
+        return done
+
+    def _add_line(self, line, done):
+        if HEADING_LINE.match(line):
+            self._flush(done)
+        self.lines.append(line)
+
+    def _flush(self, done):
+        section = "\n".join(self.lines).strip()
+        self.lines = []
+        if section:
+            done.append(section)
+
+
+def iter_sections(fragments):
+    """Turns a stream of text fragments into a stream of finished markdown sections."""
+    parser = SectionStreamParser()
+    for fragment in fragments:
+        yield from parser.feed(fragment)
+    yield from parser.close()
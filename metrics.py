@@ -0,0 +1,226 @@
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+METRICS_DISABLED = os.getenv("METRICS_DISABLED", "0") == "1"
+METRIC_PREFIX = "hpgpt"
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+
+
+# === Registry ===
+
+class Registry:
+    """
+    Process-wide latency histograms and counters, keyed by stage name.
+    Every numeric span field becomes a `<prefix>_<field>_total{stage=...}`
+    counter. Rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}   # stage -> [bucket counts..., +Inf count, sum]
+        self.counters = {}     # (field, stage) -> total
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds, fields):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[bisect_left(self.buckets, seconds)] += 1
+            histogram[-1] += seconds
+            self.count(stage, fields)
+
+    def count(self, stage, fields):
+        for field, value in fields.items():
+            self.counters[(field, stage)] = self.counters.get((field, stage), 0) + value
+
+    def add(self, stage, fields):
+        with self.lock:
+            self.count(stage, fields)
+
+    def render(self):
+        with self.lock:
+            histograms = {stage: list(values) for stage, values in self.histograms.items()}
+            counters = dict(self.counters)
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent in each pipeline stage.", f"# TYPE {name} histogram"]
+        for stage in sorted(histograms):
+            values = histograms[stage]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {values[-1]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {cumulative}')
+        for field in sorted({field for field, _ in counters}):
+            name = f"{METRIC_PREFIX}_{field}_total"
+            lines.append(f"# TYPE {name} counter")
+            for (f, stage), value in sorted(counters.items()):
+                if f == field:
+                    lines.append(f'{name}{{stage="{stage}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# === Per-Job Traces ===
+
+class Trace:
+    """
+    Timing breakdown of one job: per stage, the number of spans, their total
+    and longest duration and the sum of every field they recorded. Nested
+    stages overlap their parents (e.g. 'parse' runs inside 'chunk').
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds, fields):
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0}
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            self.add(stage, fields, entry)
+
+    def add(self, stage, fields, entry=None):
+        if entry is None:
+            entry = self.stages.setdefault(stage, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        for field, value in fields.items():
+            entry[field] = entry.get(field, 0) + value
+
+    def summary(self):
+        with self.lock:
+            stages = {stage: {field: round(value, 4) if isinstance(value, float) else value
+                              for field, value in entry.items()}
+                      for stage, entry in self.stages.items()}
+        return {'total_seconds': round(time.perf_counter() - self.started, 4), 'stages': stages}
+
+@contextmanager
+def trace():
+    """Collects every span recorded in this context (and contexts copied from it) into a Trace."""
+    job_trace = Trace()
+    token = _current_trace.set(job_trace)
+    try:
+        yield job_trace
+    finally:
+        _current_trace.reset(token)
+
+
+# === Spans ===
+
+class Span:
+    """Times a `with` block as one stage; `add(**fields)` accumulates counts such as bytes or tokens."""
+    __slots__ = ('stage', 'fields', 'trace', 'started')
+
+    def __init__(self, stage, fields):
+        self.stage = stage
+        self.fields = fields
+        self.trace = _current_trace.get()
+
+    def add(self, **fields):
+        for field, value in fields.items():
+            self.fields[field] = self.fields.get(field, 0) + value
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.add(errors=1)
+        record(self.stage, time.perf_counter() - self.started, self.fields, self.trace)
+        return False
+
+
+class _DisabledSpan:
+    __slots__ = ()
+
+    def add(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+DISABLED_SPAN = _DisabledSpan()
+
+def span(stage, **fields):
+    return DISABLED_SPAN if METRICS_DISABLED else Span(stage, fields)
+
+def record(stage, seconds, fields=None, job_trace=None):
+    """Records a duration measured elsewhere (e.g. time a job spent queued)."""
+    if METRICS_DISABLED:
+        return
+    fields = fields or {}
+    registry.observe(stage, seconds, fields)
+    job_trace = job_trace or _current_trace.get()
+    if job_trace is not None:
+        job_trace.observe(stage, seconds, fields)
+
+def count(stage, **fields):
+    """Adds to a stage's counters without recording a duration."""
+    if METRICS_DISABLED:
+        return
+    registry.add(stage, fields)
+    job_trace = _current_trace.get()
+    if job_trace is not None:
+        with job_trace.lock:
+            job_trace.add(stage, fields)
+
+def timed_iter(stage, iterable, **fields):
+    """
+    Passes a stream through, timing only the time spent producing items, so a
+    lazily read source is measured apart from whatever consumes it. String
+    items are counted as chars_out.
+    """
+    if METRICS_DISABLED:
+        return iterable
+    return _timed_iter(Span(stage, fields), iterable)
+
+def _timed_iter(stage_span, iterable):
+    elapsed = 0.0
+    items = iter(iterable)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - started
+            if isinstance(item, str):
+                stage_span.add(chars_out=len(item))
+            yield item
+    finally:
+        record(stage_span.stage, elapsed, stage_span.fields, stage_span.trace)
+
+def in_context(fn):
+    """
+    Binds `fn` to a copy of the caller's context so a worker thread reports to
+    the caller's trace. Take one binding per submitted call: a context can
+    only be entered by one thread at a time.
+    """
+    if METRICS_DISABLED:
+        return fn
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+def render_metrics():
+    return registry.render()
@@ -0,0 +1,10 @@
+import re
+from xml.sax.saxutils import escape
+
+# Control characters XML 1.0 cannot hold; LLM output occasionally contains them
+INVALID_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def xml_text(text):
+    """Text made safe for an OOXML (docx/pptx) element: invalid characters dropped, markup escaped."""
+    return escape(INVALID_XML_CHARS.sub('', text))
@@ -0,0 +1,150 @@
+import re
+from bisect import bisect_right
+from itertools import accumulate
+
+from reportlab.lib.colors import HexColor, black
+from reportlab.lib.pagesizes import LETTER
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from markdown_ir import Bullet, Paragraph, Spacer, group_sections
+
+PAGE_WIDTH, PAGE_HEIGHT = LETTER
+LEFT_MARGIN = RIGHT_MARGIN = inch * 0.7
+TOP_MARGIN = BOTTOM_MARGIN = inch * 0.7
+CONTENT_WIDTH = PAGE_WIDTH - LEFT_MARGIN - RIGHT_MARGIN
+LINE_HEIGHT = 16
+PAGE_BOTTOM = BOTTOM_MARGIN + 50   # a new page starts once y drops below this
+
+TITLE_COLOR = HexColor("#00205b")
+SUBHEADING_COLOR = TITLE_COLOR
+SUBSUBHEADING_COLOR = black
+BODY_COLOR = black
+
+# Style name -> (font, size, color); plan lines refer to styles by name
+STYLES = {
+    'title': ("Helvetica-Bold", 16, TITLE_COLOR),
+    'h1': ("Helvetica-Bold", 16, TITLE_COLOR),
+    'h2': ("Helvetica-Bold", 14, SUBHEADING_COLOR),
+    'h3': ("Helvetica-Bold", 12, SUBSUBHEADING_COLOR),
+    'body': ("Helvetica", 12, BODY_COLOR),
+}
+HEADING_STYLES = {1: 'h1', 2: 'h2'}
+
+TITLE_TRIM = re.compile(r'^[#*\-_=\s]+|[#*\-_=\s]+$')
+
+
+# === Text Measurement ===
+
+class FontMetrics:
+    """
+    Word widths for one font and size, measured once and cached. A line's
+    width is the sum of its words plus the spaces between them, so wrapping
+    never re-measures a growing line.
+    """
+
+    def __init__(self, font_name, font_size):
+        self.font_name = font_name
+        self.font_size = font_size
+        self.widths = {}
+        self.space = stringWidth(" ", font_name, font_size)
+
+    def width(self, word):
+        width = self.widths.get(word)
+        if width is None:
+            width = self.widths[word] = stringWidth(word, self.font_name, self.font_size)
+        return width
+
+    def wrap(self, text, max_width):
+        """Greedy word wrap, same breaks as measuring each candidate line whole."""
+        words = text.split()
+        if not words:
+            return []
+        # edges[k] = width of words[:k] plus one space per word; the line
+        # words[i:j] is edges[j] - edges[i] - space wide
+        edges = list(accumulate((self.width(w) + self.space for w in words), initial=0.0))
+        lines = []
+        i = 0
+        n = len(words)
+        while i < n:
+            j = bisect_right(edges, edges[i] + max_width + self.space, i + 1) - 1
+            j = max(j, i + 1)   # a word wider than the line still gets a line of its own
+            lines.append(" ".join(words[i:j]))
+            i = j
+        return lines
+
+
+_metrics = {}
+
+def get_metrics(font_name, font_size):
+    metrics = _metrics.get((font_name, font_size))
+    if metrics is None:
+        metrics = _metrics[(font_name, font_size)] = FontMetrics(font_name, font_size)
+    return metrics
+
+
+# === Page Plan ===
+
+def iter_page_plans(nodes, title):
+    """
+    Lays the document out before anything is drawn. Yields one plan per page:
+    a list of (style, x, y, text) lines in drawing order. Pages are produced
+    lazily, so streamed node sources are drawn as they arrive.
+    Page breaks follow the canvas writer: checked after every paragraph,
+    bullet or table/equation line and after each section.
+    """
+    body = get_metrics(*STYLES['body'][:2])
+    bullet_indent = body.width("•") + body.space + 6
+    page = []
+    y = PAGE_HEIGHT - TOP_MARGIN
+
+    if title:
+        title = TITLE_TRIM.sub('', title).strip()
+        metrics = get_metrics(*STYLES['title'][:2])
+        page.append(('title', (PAGE_WIDTH - metrics.width(title)) / 2.0, y, title))
+        y -= 36
+
+    for heading, body_nodes in group_sections(nodes):
+        if heading is not None:
+            style = HEADING_STYLES.get(heading.level, 'h3')
+            page.append((style, LEFT_MARGIN, y, heading.text))
+            y -= STYLES[style][1] + 6
+
+        for node in body_nodes:
+            kind = type(node)
+            if kind is Spacer:
+                y -= 12 * node.lines
+                continue
+            if kind is Bullet:
+                x = LEFT_MARGIN + bullet_indent
+                for i, line in enumerate(body.wrap(node.text, CONTENT_WIDTH - bullet_indent)):
+                    page.append(('body', x if i == 0 else x + 6, y, line))
+                    y -= LINE_HEIGHT
+            elif kind is Paragraph:
+                for line in body.wrap(node.text, CONTENT_WIDTH):
+                    page.append(('body', LEFT_MARGIN, y, line))
+                    y -= LINE_HEIGHT
+            else:
+                for raw in node.lines:
+                    for line in body.wrap(raw, CONTENT_WIDTH):
+                        page.append(('body', LEFT_MARGIN, y, line))
+                        y -= LINE_HEIGHT
+                    if y < PAGE_BOTTOM:
+                        yield page
+                        page, y = [], PAGE_HEIGHT - TOP_MARGIN
+                continue
+            if y < PAGE_BOTTOM:
+                yield page
+                page, y = [], PAGE_HEIGHT - TOP_MARGIN
+
+        # Extra line gap between sections
+        y -= LINE_HEIGHT
+        if y < PAGE_BOTTOM:
+            yield page
+            page, y = [], PAGE_HEIGHT - TOP_MARGIN
+
+    yield page
+
+def layout_document(nodes, title):
+    """The full page plan as a list (see iter_page_plans)."""
+    return list(iter_page_plans(nodes, title))
@@ -0,0 +1,114 @@
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import LETTER
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import KeepTogether, Paragraph, SimpleDocTemplate, Table, TableStyle
+from reportlab.platypus import Spacer as SpacerFlowable
+
+from markdown_ir import Bullet, Equation, Heading, Spacer, Table as TableNode
+from pdf_layout import (BOTTOM_MARGIN, CONTENT_WIDTH, LEFT_MARGIN, LINE_HEIGHT, RIGHT_MARGIN,
+                        STYLES, TITLE_TRIM, TOP_MARGIN)
+
+TABLE_HEADER_BACKGROUND = colors.HexColor("#e8ecf4")
+TABLE_GRID_COLOR = colors.HexColor("#b0b7c3")
+KEEP_TABLE_ROWS = 12   # shorter tables are never split across pages
+
+_styles = {}
+
+
+# === Style Cache ===
+
+def get_style(name):
+    """ParagraphStyles are built once per process and shared by every document."""
+    style = _styles.get(name)
+    if style is None:
+        style = _styles[name] = _build_style(name)
+    return style
+
+def _build_style(name):
+    font_name, font_size, color = STYLES['body']
+    base = dict(fontName=font_name, fontSize=font_size, leading=LINE_HEIGHT, textColor=color)
+    if name == 'title':
+        font_name, font_size, color = STYLES['title']
+        return ParagraphStyle(name, fontName=font_name, fontSize=font_size, leading=font_size + 4,
+                              textColor=color, alignment=TA_CENTER, spaceAfter=16)
+    if name in ('h1', 'h2', 'h3'):
+        font_name, font_size, color = STYLES[name]
+        # keepWithNext moves a heading to the next page together with its first block
+        return ParagraphStyle(name, fontName=font_name, fontSize=font_size, leading=font_size + 6,
+                              textColor=color, spaceBefore=4, spaceAfter=2, keepWithNext=1)
+    if name == 'bullet':
+        return ParagraphStyle(name, leftIndent=18, bulletIndent=6, **base)
+    if name == 'equation':
+        return ParagraphStyle(name, **dict(base, fontName="Courier"))
+    if name == 'cell':
+        return ParagraphStyle(name, **dict(base, fontSize=10, leading=12))
+    if name == 'header_cell':
+        return ParagraphStyle(name, **dict(base, fontName="Helvetica-Bold", fontSize=10, leading=12))
+    return ParagraphStyle(name, **base)
+
+def get_table_style():
+    style = _styles.get('table')
+    if style is None:
+        style = _styles['table'] = TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, TABLE_GRID_COLOR),
+            ('BACKGROUND', (0, 0), (-1, 0), TABLE_HEADER_BACKGROUND),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ])
+    return style
+
+
+# === IR -> Flowables ===
+
+def table_flowable(node):
+    rows = node.rows()
+    if not rows:
+        return None
+    columns = max(len(row) for row in rows)
+    header, cell = get_style('header_cell'), get_style('cell')
+    data = [[Paragraph(escape(text), header if r == 0 else cell) for text in row + [''] * (columns - len(row))]
+            for r, row in enumerate(rows)]
+    table = Table(data, colWidths=[CONTENT_WIDTH / columns] * columns, repeatRows=1, hAlign='LEFT')
+    table.setStyle(get_table_style())
+    return KeepTogether([table]) if len(rows) <= KEEP_TABLE_ROWS else table
+
+def iter_flowables(nodes, title):
+    if title:
+        yield Paragraph(escape(TITLE_TRIM.sub('', title).strip()), get_style('title'))
+    body, bullet, equation = get_style('body'), get_style('bullet'), get_style('equation')
+    first = True
+    for node in nodes:
+        kind = type(node)
+        if kind is Heading:
+            if not first:
+                yield SpacerFlowable(1, LINE_HEIGHT)   # gap between sections
+            yield Paragraph(escape(node.text), get_style({1: 'h1', 2: 'h2'}.get(node.level, 'h3')))
+        elif kind is Spacer:
+            yield SpacerFlowable(1, 12 * node.lines)
+        elif kind is Bullet:
+            yield Paragraph(escape(node.text), bullet, bulletText='•')
+        elif kind is TableNode:
+            table = table_flowable(node)
+            if table is not None:
+                yield table
+        elif kind is Equation:
+            yield Paragraph("<br/>".join(escape(line) for line in node.lines), equation)
+        else:
+            yield Paragraph(escape(node.text), body)
+        first = False
+
+
+def write_pdf_flowables(nodes, output_path, title, on_page):
+    """
+    Platypus rendering: headings keep with the block after them, tables are
+    real tables (header row repeated across pages) and paragraphs wrap and
+    split at page ends. SimpleDocTemplate.build paginates in a single pass.
+    `on_page(canvas, doc)` draws the page furniture (footer).
+    """
+    doc = SimpleDocTemplate(output_path, pagesize=LETTER, leftMargin=LEFT_MARGIN, rightMargin=RIGHT_MARGIN,
+                            topMargin=TOP_MARGIN, bottomMargin=BOTTOM_MARGIN + 12, title=title or "")
+    doc.build(list(iter_flowables(nodes, title)), onFirstPage=on_page, onLaterPages=on_page)
@@ -0,0 +1,25 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# One pool serves all CPU-bound work (PDF page extraction, multi-format
+# rendering, opt-in slide rendering), so a server process keeps at most
+# POOL_WORKERS worker processes, however many kinds of work it runs
+POOL_WORKERS = int(os.getenv("POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """
+    The process pool shared by all requests, created on first use. 'spawn'
+    keeps workers safe to create from threaded servers; module imports are
+    paid once per worker. Tasks running in it must not submit to it.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
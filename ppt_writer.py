@@ -1,27 +1,37 @@
 from pptx import Presentation
-from pptx.util import Pt, Inches
-from pptx.enum.text import PP_ALIGN
+from pptx.util import Emu, Pt, Inches
 from pptx.dml.color import RGBColor
-from pptx.enum.shapes import MSO_SHAPE
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, qn
+from io import BytesIO
+from lxml import etree
+import multiprocessing
 import os
 import re
-import textwrap
+import threading
+import zipfile
+from markdown_ir import Bullet, Equation, Paragraph, Table, group_sections, iter_block_nodes, parse_markdown
+from ooxml import xml_text
+from pdf_layout import get_metrics
+from pools import POOL_WORKERS, get_process_pool
 
 # --- Slide layout ---
 SLIDE_WIDTH = Inches(10)
 SLIDE_HEIGHT = Inches(7.5)
 TITLE_TOP = Inches(0.1)
 TITLE_HEIGHT = Inches(0.9)
-CONTENT_TOP = TITLE_TOP + TITLE_HEIGHT + Inches(0.2)
+CONTENT_TOP = Emu(TITLE_TOP + TITLE_HEIGHT + Inches(0.2))
 CONTENT_LEFT = Inches(0.5)
-CONTENT_WIDTH = SLIDE_WIDTH - 2 * CONTENT_LEFT
-CONTENT_HEIGHT = SLIDE_HEIGHT - CONTENT_TOP - Inches(0.5)
+CONTENT_WIDTH = Emu(SLIDE_WIDTH - 2 * CONTENT_LEFT)
+CONTENT_HEIGHT = Emu(SLIDE_HEIGHT - CONTENT_TOP - Inches(0.5))
 
 # --- Fonts and Colors ---
 TITLE_FONT_SIZE = Pt(30)
 BULLET_FONT_SIZE = Pt(16)
 TABLE_FONT_SIZE = Pt(13)
 BULLET_INDENT = Inches(0.25)
+BULLET_SPACE_BEFORE = 2   # pt
+BULLET_SPACE_AFTER = 6    # pt
 FOOTER_FONT_SIZE = Pt(11)
 FOOTER_COLOR = RGBColor(228, 0, 43)
 
@@ -32,6 +42,54 @@ TABLE_HEADER_BG = RGBColor(228, 0, 43)
 TABLE_HEADER_FONT_COLOR = RGBColor(255, 255, 255)
 TABLE_ROW_ALT_BG = RGBColor(240, 240, 240)
 TEXT_COLOR = RGBColor(30, 30, 30)
+COVER_BG_COLOR = RGBColor(240, 240, 255)
+FONT_NAME = "Segoe UI"
+
+# --- Template ---
+# Title bar, backgrounds and footer live in the slide layouts, so a slide is
+# just its title and body text. A designer-made .pptx can replace the built-in
+# template as long as it provides layouts with these names.
+PPT_TEMPLATE_PATH = os.getenv("PPT_TEMPLATE_PATH")
+COVER_LAYOUT = "HPGPT Cover"
+CONTENT_LAYOUT = "HPGPT Content"
+TABLE_LAYOUT = "HPGPT Table"
+BODY_PLACEHOLDER_IDX = 1
+
+_template_bytes = None
+_template_layouts = None
+_template_lock = threading.Lock()
+
+# --- Package assembly ---
+# Slides are rendered straight to XML and zipped into a copy of the template
+# package in one pass. Inline rendering manages about 10k slides/s, faster
+# than the process pool at every size benchmarks/bench_ppt.py measured, so
+# the pool is opt-in: PPT_PARALLEL_SLIDES > 0 sends decks that large to it
+PPT_WORKERS = int(os.getenv("PPT_WORKERS", str(POOL_WORKERS)))   # slide chunks are sized for this many
+PPT_PARALLEL_SLIDES = int(os.getenv("PPT_PARALLEL_SLIDES", "0"))
+SLIDE_LAYOUTS = {"COVER": COVER_LAYOUT, "TEXT": CONTENT_LAYOUT, "TABLE": TABLE_LAYOUT, "REFERENCES": CONTENT_LAYOUT}
+SLIDE_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.slide+xml"
+SLIDE_RELTYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide"
+LAYOUT_RELTYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slideLayout"
+PACKAGE_RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CONTENT_TYPES_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+TABLE_STYLE_ID = "{5C22544A-7EE6-4342-B048-85BDC9FD1C3A}"   # Medium Style 2 - Accent 1
+
+# --- Text fitting ---
+# Slides are filled by measured height. Text is measured with Segoe UI when
+# its TrueType files can be found, otherwise with Helvetica widened by
+# FALLBACK_WIDTH_SCALE (Segoe UI sets a little wider), so fits err roomy.
+FONT_DIRS = [d for d in os.getenv("PPT_FONT_DIRS", "").split(os.pathsep) if d] + [
+    "C:/Windows/Fonts", "/usr/share/fonts/truetype/msttcorefonts", "/Library/Fonts", os.path.expanduser("~/.fonts")]
+FALLBACK_WIDTH_SCALE = 1.05
+LINE_SPACING = 1.2          # single spacing, as a multiple of the font size
+TEXT_INSET = Inches(0.1)    # default left/right text inset; top/bottom are half of it
+BODY_TEXT_WIDTH = Emu(CONTENT_WIDTH - 2 * TEXT_INSET - BULLET_INDENT)
+BODY_TEXT_HEIGHT = Emu(CONTENT_HEIGHT - TEXT_INSET)
+TABLE_CELL_WIDTH_PAD = Emu(2 * TEXT_INSET)
+
+_measure_fonts = None
+
+LIST_MARKER = re.compile(r'^[-•*0-9. ]+')
 
 def flatten_to_string(item):
     """Recursively flattens tuples/lists and returns a string."""
@@ -39,41 +97,119 @@ def flatten_to_string(item):
         return " ".join(flatten_to_string(i) for i in item)
     return str(item)
 
-def add_footer(slide, page_num):
-    # Add left aligned "HPGPT"
-    left_box = slide.shapes.add_textbox(Inches(0.5), SLIDE_HEIGHT - Inches(0.30), Inches(3), Pt(FOOTER_FONT_SIZE.pt + 8))
-    left_tf = left_box.text_frame
-    left_tf.clear()
-    p_left = left_tf.paragraphs[0]
-    p_left.text = "HPGPT"
-    p_left.font.size = FOOTER_FONT_SIZE
-    p_left.font.bold = True
-    p_left.font.name = "Segoe UI"
-    p_left.font.color.rgb = FOOTER_COLOR
-    p_left.alignment = PP_ALIGN.LEFT
-
-    # Add right aligned page number
-    right_box_width = Inches(3)
-    right_box_left = SLIDE_WIDTH - Inches(0.5) - right_box_width
-    right_box = slide.shapes.add_textbox(right_box_left, SLIDE_HEIGHT - Inches(0.30), right_box_width, Pt(FOOTER_FONT_SIZE.pt + 8))
-    right_tf = right_box.text_frame
-    right_tf.clear()
-    p_right = right_tf.paragraphs[0]
-    p_right.text = f"Page {page_num}"
-    p_right.font.size = FOOTER_FONT_SIZE
-    p_right.font.bold = True
-    p_right.font.name = "Segoe UI"
-    p_right.font.color.rgb = FOOTER_COLOR
-    p_right.alignment = PP_ALIGN.RIGHT
-
-def add_cover_slide(prs, filename_title):
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-    bg_fill = slide.background.fill
-    bg_fill.solid()
-    bg_fill.fore_color.rgb = RGBColor(240, 240, 255)
-    textbox = slide.shapes.add_textbox(Inches(1.5), SLIDE_HEIGHT / 2 - TITLE_HEIGHT / 2,
-                                       SLIDE_WIDTH - Inches(3), TITLE_HEIGHT)
+# === Template ===
+
+def text_style_xml(size, color, bold=False, align="l", margin_left=0, space_before=0, space_after=0):
+    """Level-1 paragraph and run defaults for a layout placeholder (a:lstStyle)."""
+    return parse_xml(
+        f'<a:lstStyle {nsdecls("a")}>'
+        f'<a:lvl1pPr marL="{int(margin_left)}" indent="0" algn="{align}">'
+        f'<a:spcBef><a:spcPts val="{int(space_before * 100)}"/></a:spcBef>'
+        f'<a:spcAft><a:spcPts val="{int(space_after * 100)}"/></a:spcAft>'
+        f'<a:buNone/>'
+        f'<a:defRPr sz="{int(size.pt * 100)}" b="{int(bold)}">'
+        f'<a:solidFill><a:srgbClr val="{color}"/></a:solidFill>'
+        f'<a:latin typeface="{FONT_NAME}"/><a:cs typeface="{FONT_NAME}"/>'
+        f'</a:defRPr></a:lvl1pPr></a:lstStyle>')
+
+def style_placeholder(shape, left, top, width, height, fill, lst_style, anchor="ctr"):
+    shape.left, shape.top, shape.width, shape.height = int(left), int(top), int(width), int(height)
+    shape.fill.solid()
+    shape.fill.fore_color.rgb = fill
+    txBody = shape._element.txBody
+    txBody.replace(txBody.find(qn('a:lstStyle')), lst_style)
+    txBody.find(qn('a:bodyPr')).set('anchor', anchor)
+
+def footer_xml(shape_id, name, left, align, content):
+    """A static footer text box; `content` is the inner XML of its paragraph."""
+    return parse_xml(
+        f'<p:sp {nsdecls("p", "a")}>'
+        f'<p:nvSpPr><p:cNvPr id="{shape_id}" name="{name}"/><p:cNvSpPr txBox="1"/><p:nvPr userDrawn="1"/></p:nvSpPr>'
+        f'<p:spPr><a:xfrm><a:off x="{int(left)}" y="{int(SLIDE_HEIGHT - Inches(0.30))}"/>'
+        f'<a:ext cx="{int(Inches(3))}" cy="{int(Pt(FOOTER_FONT_SIZE.pt + 8))}"/></a:xfrm>'
+        f'<a:prstGeom prst="rect"><a:avLst/></a:prstGeom><a:noFill/></p:spPr>'
+        f'<p:txBody><a:bodyPr wrap="square" rtlCol="0"><a:spAutoFit/></a:bodyPr><a:lstStyle/>'
+        f'<a:p><a:pPr algn="{align}"/>{content}</a:p></p:txBody></p:sp>')
+
+def add_layout_footer(layout):
+    """"HPGPT" on the left and a live slide-number field on the right."""
+    rpr = (f'<a:rPr lang="en-US" sz="{int(FOOTER_FONT_SIZE.pt * 100)}" b="1">'
+           f'<a:solidFill><a:srgbClr val="{FOOTER_COLOR}"/></a:solidFill>'
+           f'<a:latin typeface="{FONT_NAME}"/><a:cs typeface="{FONT_NAME}"/></a:rPr>')
+    tree = layout.shapes._spTree
+    next_id = max(int(e.get('id')) for e in tree.iter(qn('p:cNvPr'))) + 1
+    tree.append(footer_xml(next_id, "Footer Brand", Inches(0.5), "l", f'<a:r>{rpr}<a:t>HPGPT</a:t></a:r>'))
+    tree.append(footer_xml(next_id + 1, "Footer Page", SLIDE_WIDTH - Inches(0.5) - Inches(3), "r",
+                           f'<a:r>{rpr}<a:t>Page </a:t></a:r>'
+                           f'<a:fld id="{{B6F15528-21DE-4FAA-801E-634DDDAF4B2B}}" type="slidenum">{rpr}<a:t>‹#›</a:t></a:fld>'))
+
+def set_layout(layout, name, background, keep_body=False):
+    """Renames a stock layout and strips the placeholders its slides won't use."""
+    layout._element.cSld.set('name', name)
+    set_slide_background(layout, background)
+    for shape in list(layout.placeholders):
+        if shape.placeholder_format.idx != 0 and not (keep_body and shape.placeholder_format.idx == BODY_PLACEHOLDER_IDX):
+            shape._element.getparent().remove(shape._element)
+    return layout
+
+def build_template():
+    """The branded template as .pptx bytes, derived from python-pptx's default deck."""
+    prs = Presentation()
+    prs.slide_width, prs.slide_height = SLIDE_WIDTH, SLIDE_HEIGHT
+    stock = {layout.name: layout for layout in prs.slide_layouts}
+    keep = {'Title Slide', 'Title and Content', 'Title Only'}
+    for name, layout in stock.items():
+        if name not in keep:
+            prs.slide_layouts.remove(layout)
+
+    title_style = text_style_xml(TITLE_FONT_SIZE, TITLE_FONT_COLOR, bold=True, align="ctr")
+    cover = set_layout(stock['Title Slide'], COVER_LAYOUT, COVER_BG_COLOR)
+    style_placeholder(cover.placeholders[0], Inches(1.5), SLIDE_HEIGHT / 2 - TITLE_HEIGHT / 2,
+                      SLIDE_WIDTH - Inches(3), TITLE_HEIGHT, COVER_BG_COLOR, title_style)
+
+    content = set_layout(stock['Title and Content'], CONTENT_LAYOUT, RGBColor(255, 255, 255), keep_body=True)
+    table = set_layout(stock['Title Only'], TABLE_LAYOUT, RGBColor(255, 255, 255))
+    for layout in (content, table):
+        style_placeholder(layout.placeholders[0], 0, TITLE_TOP, SLIDE_WIDTH, TITLE_HEIGHT, TITLE_BG_COLOR,
+                          text_style_xml(TITLE_FONT_SIZE, TITLE_FONT_COLOR, bold=True, align="ctr"))
+        add_layout_footer(layout)
+    style_placeholder(content.placeholders[BODY_PLACEHOLDER_IDX], CONTENT_LEFT, CONTENT_TOP,
+                      CONTENT_WIDTH, CONTENT_HEIGHT, CONTENT_BG_COLOR,
+                      text_style_xml(BULLET_FONT_SIZE, TEXT_COLOR, margin_left=BULLET_INDENT,
+                                     space_before=BULLET_SPACE_BEFORE, space_after=BULLET_SPACE_AFTER))
 
+    buffer = BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+def get_template_bytes():
+    """The template is built (or read from PPT_TEMPLATE_PATH) once per process."""
+    global _template_bytes
+    with _template_lock:
+        if _template_bytes is None:
+            if PPT_TEMPLATE_PATH:
+                with open(PPT_TEMPLATE_PATH, 'rb') as f:
+                    _template_bytes = f.read()
+            else:
+                _template_bytes = build_template()
+        return _template_bytes
+
+def get_template_layouts():
+    """Layout name -> layout part inside the template package."""
+    global _template_layouts
+    template = get_template_bytes()
+    with _template_lock:
+        if _template_layouts is None:
+            layouts = {}
+            with zipfile.ZipFile(BytesIO(template)) as package:
+                for name in package.namelist():
+                    if re.fullmatch(r'ppt/slideLayouts/slideLayout\d+\.xml', name):
+                        layouts[etree.fromstring(package.read(name)).find(qn('p:cSld')).get('name')] = name
+            _template_layouts = layouts
+        return _template_layouts
+
+def format_cover_title(filename_title):
+    """Title-cases the document title and wraps it for the cover slide."""
     from textwrap import fill
 
     def format_title_properly(title: str) -> str:
@@ -95,28 +231,94 @@ def add_cover_slide(prs, filename_title):
 
     raw_title = flatten_to_string(filename_title)
     formatted_title = format_title_properly(raw_title)
-    wrapped_title = fill(formatted_title, width=40)
-
-    tf = textbox.text_frame
-    tf.clear()
-    p = tf.paragraphs[0]
-    p.text = wrapped_title
-    p.font.size = TITLE_FONT_SIZE
-    p.font.bold = True
-    p.font.name = "Segoe UI"
-    p.font.color.rgb = TITLE_FONT_COLOR
-    p.alignment = PP_ALIGN.CENTER
-    p.word_wrap = True
-    textbox.fill.solid()
-    textbox.fill.fore_color.rgb = RGBColor(240, 240, 255)
-    textbox.line.fill.background()
-
-def split_section(title, bullets, max_len=10):
-    slides = []
-    for i in range(0, len(bullets), max_len):
-        part_title = f"{title} (Part {i // max_len + 1})" if i > 0 else title
-        slides.append((part_title, bullets[i:i + max_len]))
-    return slides
+    return fill(formatted_title, width=40)
+
+# === Slide Fitting ===
+
+def find_font(file_name, font_name):
+    """Registers a TrueType font with reportlab if it is installed; returns its name or None."""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    for directory in FONT_DIRS:
+        path = os.path.join(directory, file_name)
+        if os.path.isfile(path):
+            pdfmetrics.registerFont(TTFont(font_name, path))
+            return font_name
+    return None
+
+def text_metrics(size, bold=False):
+    """Cached word widths for slide text at `size` (see pdf_layout.FontMetrics)."""
+    global _measure_fonts
+    if _measure_fonts is None:
+        _measure_fonts = (find_font("segoeui.ttf", "SegoeUI") or "Helvetica",
+                          find_font("segoeuib.ttf", "SegoeUI-Bold") or "Helvetica-Bold")
+    font = _measure_fonts[bold]
+    scale = 1 if font.startswith("SegoeUI") else FALLBACK_WIDTH_SCALE
+    return get_metrics(font, size.pt * scale)
+
+def measured_bullets(bullets):
+    """
+    Yields (text, height in pt) per bullet paragraph as it renders in the body
+    placeholder. A paragraph taller than a whole slide is cut at line breaks.
+    """
+    line_height = BULLET_FONT_SIZE.pt * LINE_SPACING
+    spacing = BULLET_SPACE_BEFORE + BULLET_SPACE_AFTER
+    lines_per_slide = max(1, int((BODY_TEXT_HEIGHT.pt - spacing) // line_height))
+    for text in bullets:
+        shown = text.strip().replace('*', '')
+        lines = text_metrics(BULLET_FONT_SIZE, shown.endswith(":")).wrap(shown, BODY_TEXT_WIDTH.pt) or [shown]
+        if len(lines) <= lines_per_slide:
+            yield text, len(lines) * line_height + spacing
+            continue
+        for i in range(0, len(lines), lines_per_slide):
+            part = lines[i:i + lines_per_slide]
+            yield " ".join(part), len(part) * line_height + spacing
+
+def fit_bullets(bullets):
+    """Packs bullets into slide-sized lists against the body text height."""
+    limit = BODY_TEXT_HEIGHT.pt
+    page, heights, used = [], [], 0.0
+    for text, height in measured_bullets(bullets):
+        if page and used + height > limit:
+            # A trailing "Label:" moves on with the lines it introduces
+            keep = 1 if len(page) > 1 and page[-1].endswith(":") and heights[-1] + height <= limit else 0
+            yield page[:len(page) - keep]
+            page, heights = page[len(page) - keep:], heights[len(heights) - keep:]
+            used = sum(heights)
+        page.append(text)
+        heights.append(height)
+        used += height
+    if page:
+        yield page
+
+def table_row_heights(rows):
+    """Rendered height in pt of every row, each cell wrapped to its column width."""
+    width = CONTENT_WIDTH.pt / len(rows[0]) - TABLE_CELL_WIDTH_PAD.pt
+    line_height = TABLE_FONT_SIZE.pt * LINE_SPACING
+    heights = []
+    for r, row in enumerate(rows):
+        metrics = text_metrics(TABLE_FONT_SIZE, r == 0)
+        lines = max((len(metrics.wrap(flatten_to_string(cell).replace('*', ''), width)) or 1) for cell in row)
+        heights.append(lines * line_height + TEXT_INSET.pt)
+    return heights
+
+def fit_table(rows):
+    """Splits a table into slide-sized pieces by row height; every piece repeats the header row."""
+    heights = table_row_heights(rows)
+    limit = CONTENT_HEIGHT.pt
+    piece, used = [], heights[0]
+    for row, height in zip(rows[1:], heights[1:]):
+        if piece and used + height > limit:
+            yield [rows[0]] + piece
+            piece, used = [], heights[0]
+        piece.append(row)
+        used += height
+    yield [rows[0]] + piece
+
+def number_parts(title, parts):
+    """Continuation slides are titled "<title> (Part N)"."""
+    for i, part in enumerate(parts):
+        yield (f"{title} (Part {i + 1})" if i > 0 else title), part
 
 def clean_title(raw_title):
     title = raw_title.strip()
@@ -124,155 +326,270 @@ def clean_title(raw_title):
     title = title.replace('*', '')
     return title.title() if title else "Untitled Section"
 
-def extract_table(text_block):
-    lines = [line.strip() for line in text_block.splitlines() if '|' in line]
-    if len(lines) < 2:
+def extract_table(table):
+    rows = [[flatten_to_string(cell) for cell in row if cell] for row in table.rows()]
+    if len(rows) < 2:
         return None
-    headers = [flatten_to_string(cell.strip()) for cell in lines[0].split('|') if cell.strip()]
-    rows = []
-    for line in lines[2:]:
-        cells = [flatten_to_string(cell.strip()) for cell in line.split('|') if cell.strip()]
-        if len(cells) == len(headers):
-            rows.append(cells)
-    return [headers] + rows if rows else None
+    headers = rows[0]
+    body = [row for row in rows[1:] if len(row) == len(headers)]
+    return [headers] + body if body else None
+
+def section_lines(nodes):
+    for node in nodes:
+        kind = type(node)
+        if kind is Bullet or kind is Paragraph:
+            yield node.text
+        elif kind is Equation:
+            yield from node.lines
 
 def extract_sections(content):
-    sections = re.split(r'\n(?=#+\s|^Slide\s*\d+:|^\*\*.+?\*\*|^\w.+?:)', content, flags=re.MULTILINE)
-    structured = []
-    for section in sections:
-        section = section.strip()
-        if not section:
+    """
+    Turns markdown (or already parsed IR nodes) into slide specs:
+    ("TEXT", title, bullet_lines) and ("TABLE", title, rows).
+    """
+    nodes = parse_markdown(content) if isinstance(content, str) else content
+    return list(iter_slide_specs(nodes))
+
+def iter_slide_specs(nodes):
+    """
+    Every heading starts a slide; text before the first heading uses its first
+    line as title. Bullets and table rows are measured and spread over as many
+    slides as they need. Accepts a stream of nodes and yields slides section by section.
+    """
+    for heading, body in group_sections(nodes):
+        lines = list(section_lines(body))
+        if heading is not None:
+            title = clean_title(heading.text)
+        elif lines:
+            title = clean_title(lines.pop(0))
+        else:
             continue
-        lines = section.splitlines()
-        if len(lines) < 2:
+        bullets = []
+        for line in lines:
+            clean_line = LIST_MARKER.sub('', flatten_to_string(line)).strip()
+            if clean_line:
+                bullets.append(clean_line)
+        tables = [t for t in (extract_table(node) for node in body if type(node) is Table) if t]
+        if not bullets and not tables:
             continue
-        title = clean_title(lines[0])
-        section_body = "\n".join(lines[1:])
-        table = extract_table(section_body)
+        yield from (("TEXT", t, b) for t, b in number_parts(title, fit_bullets(bullets)))
+        for table in tables:
+            yield from (("TABLE", t, piece) for t, piece in number_parts(title, fit_table(table)))
+
+def deck_table(table):
+    """Rows of a JSON slide table, given as {"header": [...], "rows": [[...]]} or as a list of rows."""
+    if isinstance(table, dict):
+        rows = [table.get('header') or []] + list(table.get('rows') or [])
+    elif isinstance(table, list):
+        rows = table
+    else:
+        return None
+    rows = [[flatten_to_string(cell).strip() for cell in row] for row in rows if isinstance(row, list)]
+    if len(rows) < 2 or not rows[0]:
+        return None
+    width = len(rows[0])
+    return [rows[0]] + [(row + [""] * width)[:width] for row in rows[1:]]
+
+def iter_deck_specs(slides):
+    """
+    Slide specs from a structured deck (see prompts.SLIDES_JSON_PROMPT): one
+    dict per slide with a title, bullets and an optional table. Text and
+    tables are still measured, so an over-long slide continues on the next.
+    Markdown strings (replies that were not JSON) go through iter_slide_specs.
+    """
+    for slide in slides:
+        if isinstance(slide, str):
+            yield from iter_slide_specs(parse_markdown(slide))
+            continue
+        title = flatten_to_string(slide.get('title') or "").strip() or "Untitled Section"
+        bullets = slide.get('bullets') or []
+        bullets = [flatten_to_string(b).strip() for b in (bullets if isinstance(bullets, list) else [bullets])]
+        bullets = [b for b in bullets if b]
+        table = deck_table(slide.get('table'))
+        if bullets:
+            yield from (("TEXT", t, b) for t, b in number_parts(title, fit_bullets(bullets)))
         if table:
-            structured.append(("TABLE", title, table))
-        else:
-            bullets = []
-            for line in lines[1:]:
-                clean_line = re.sub(r'^[-•*0-9. ]+', '', flatten_to_string(line)).replace('*', '')
-                if clean_line:
-                    bullets.extend(textwrap.wrap(clean_line, width=90))
-            structured.extend([("TEXT", t, b) for t, b in split_section(title, bullets)])
-    return structured
+            yield from (("TABLE", t, piece) for t, piece in number_parts(title, fit_table(table)))
 
 def set_slide_background(slide, color=RGBColor(255, 255, 255)):
     fill = slide.background.fill
     fill.solid()
     fill.fore_color.rgb = color
 
-def add_title(slide, title_text):
-    shape = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, TITLE_TOP, SLIDE_WIDTH, TITLE_HEIGHT)
-    shape.fill.solid()
-    shape.fill.fore_color.rgb = TITLE_BG_COLOR
-    shape.line.fill.background()
-    tf = shape.text_frame
-    tf.clear()
-    p = tf.paragraphs[0]
-    p.text = flatten_to_string(title_text).replace('*', '')
-    p.font.size = TITLE_FONT_SIZE
-    p.font.name = "Segoe UI"
-    p.font.bold = True
-    p.font.color.rgb = TITLE_FONT_COLOR
-    p.alignment = PP_ALIGN.CENTER
-
-def add_bullets(slide, bullet_lines):
-    shape = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, CONTENT_LEFT, CONTENT_TOP, CONTENT_WIDTH, CONTENT_HEIGHT)
-    shape.fill.solid()
-    shape.fill.fore_color.rgb = CONTENT_BG_COLOR
-    shape.line.fill.background()
-    tf = shape.text_frame
-    tf.clear()
-    for i, line in enumerate(bullet_lines):
-        s_val = flatten_to_string(line)
-        p = tf.add_paragraph()
-        p.text = s_val.strip().replace('*', '')
-        p.font.name = "Segoe UI"
-        p.font.size = BULLET_FONT_SIZE
-        p.font.color.rgb = TEXT_COLOR
-        p.margin_left = BULLET_INDENT
-        p.font.bold = s_val.strip().endswith(":")
-        p.alignment = PP_ALIGN.LEFT
-        p.space_before = Pt(2 if i > 0 else 0)
-        p.space_after = Pt(6)
-
-def add_table(slide, table_data):
-    rows = len(table_data)
+# === Slide XML ===
+
+PLAIN_RPR = '<a:rPr lang="en-US"/>'
+BOLD_RPR = '<a:rPr lang="en-US" b="1"/>'
+TABLE_HEADER_RPR = (f'<a:rPr lang="en-US" sz="{int(TABLE_FONT_SIZE.pt * 100)}" b="1">'
+                    f'<a:solidFill><a:srgbClr val="{TABLE_HEADER_FONT_COLOR}"/></a:solidFill>'
+                    f'<a:latin typeface="{FONT_NAME}"/></a:rPr>')
+TABLE_BODY_RPR = f'<a:rPr lang="en-US" sz="{int(TABLE_FONT_SIZE.pt * 100)}"><a:latin typeface="{FONT_NAME}"/></a:rPr>'
+
+def run_xml(text, rpr=PLAIN_RPR):
+    return f'<a:r>{rpr}<a:t>{xml_text(text)}</a:t></a:r>'
+
+def placeholder_xml(shape_id, name, ph, paragraphs):
+    """A shape filling a layout placeholder; position and formatting are inherited."""
+    return (f'<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="{name}"/>'
+            f'<p:cNvSpPr><a:spLocks noGrp="1"/></p:cNvSpPr><p:nvPr>{ph}</p:nvPr></p:nvSpPr>'
+            f'<p:spPr/><p:txBody><a:bodyPr/><a:lstStyle/>{paragraphs}</p:txBody></p:sp>')
+
+def title_xml(title, ph_type="title"):
+    runs = '<a:br/>'.join(run_xml(line) for line in title.split("\n"))
+    return placeholder_xml(2, "Title 1", f'<p:ph type="{ph_type}"/>', f'<a:p>{runs}</a:p>')
+
+def bullets_xml(bullet_lines, bold_labels=True):
+    paragraphs = []
+    for line in bullet_lines:
+        s_val = flatten_to_string(line).strip()
+        rpr = BOLD_RPR if bold_labels and s_val.endswith(":") else PLAIN_RPR
+        paragraphs.append(f'<a:p>{run_xml(s_val.replace("*", ""), rpr)}</a:p>')
+    return placeholder_xml(3, "Content Placeholder 2", f'<p:ph idx="{BODY_PLACEHOLDER_IDX}"/>', ''.join(paragraphs))
+
+def cell_xml(value, align, rpr, fill=None):
+    fill = f'<a:solidFill><a:srgbClr val="{fill}"/></a:solidFill>' if fill else ''
+    return (f'<a:tc><a:txBody><a:bodyPr/><a:lstStyle/><a:p><a:pPr algn="{align}"/>'
+            f'{run_xml(flatten_to_string(value).replace("*", ""), rpr)}</a:p></a:txBody><a:tcPr>{fill}</a:tcPr></a:tc>')
+
+def table_xml(table_data):
+    """Header row in the brand red, alternate body rows shaded; rows sized to their measured height."""
     cols = len(table_data[0])
-    table_shape = slide.shapes.add_table(rows, cols, CONTENT_LEFT, CONTENT_TOP, CONTENT_WIDTH, CONTENT_HEIGHT)
-    table = table_shape.table
-    for col, value in enumerate(table_data[0]):
-        s_val = flatten_to_string(value)
-        cell = table.cell(0, col)
-        cell.text = s_val.replace('*', '')
-        para = cell.text_frame.paragraphs[0]
-        para.font.size = TABLE_FONT_SIZE
-        para.font.bold = True
-        para.font.name = "Segoe UI"
-        para.font.color.rgb = TABLE_HEADER_FONT_COLOR
-        para.alignment = PP_ALIGN.CENTER
-        cell.fill.solid()
-        cell.fill.fore_color.rgb = TABLE_HEADER_BG
-    for row_idx, row in enumerate(table_data[1:], start=1):
-        for col_idx, value in enumerate(row):
-            s_val = flatten_to_string(value)
-            cell = table.cell(row_idx, col_idx)
-            cell.text = s_val.replace('*', '')
-            para = cell.text_frame.paragraphs[0]
-            para.font.name = "Segoe UI"
-            para.font.size = TABLE_FONT_SIZE
-            para.alignment = PP_ALIGN.LEFT
-            if row_idx % 2 == 1:
-                cell.fill.solid()
-                cell.fill.fore_color.rgb = TABLE_ROW_ALT_BG
-
-def add_references_slide(prs, references, page_num):
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-    set_slide_background(slide, CONTENT_BG_COLOR)
-    add_title(slide, "References")
-    shape = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, CONTENT_LEFT, CONTENT_TOP, CONTENT_WIDTH, CONTENT_HEIGHT)
-    shape.fill.solid()
-    shape.fill.fore_color.rgb = CONTENT_BG_COLOR
-    shape.line.fill.background()
-    tf = shape.text_frame
-    tf.clear()
-    for ref in references:
-        s_val = flatten_to_string(ref)
-        p = tf.add_paragraph()
-        p.text = s_val.replace('*', '')
-        p.font.name = "Segoe UI"
-        p.font.size = BULLET_FONT_SIZE
-        p.font.color.rgb = TEXT_COLOR
-        p.alignment = PP_ALIGN.LEFT
-        p.margin_left = BULLET_INDENT
-        p.space_after = Pt(4)
-    add_footer(slide, page_num)
+    col_width = CONTENT_WIDTH // cols
+    heights = table_row_heights(table_data)
+    rows = []
+    for r, (row, height) in enumerate(zip(table_data, heights)):
+        if r == 0:
+            cells = ''.join(cell_xml(value, "ctr", TABLE_HEADER_RPR, TABLE_HEADER_BG) for value in row)
+        else:
+            fill = TABLE_ROW_ALT_BG if r % 2 == 1 else None
+            cells = ''.join(cell_xml(value, "l", TABLE_BODY_RPR, fill) for value in row)
+        rows.append(f'<a:tr h="{int(Pt(height))}">{cells}</a:tr>')
+    grid = f'<a:gridCol w="{col_width}"/>' * cols
+    return (f'<p:graphicFrame><p:nvGraphicFramePr><p:cNvPr id="3" name="Table 2"/>'
+            f'<p:cNvGraphicFramePr><a:graphicFrameLocks noGrp="1"/></p:cNvGraphicFramePr><p:nvPr/></p:nvGraphicFramePr>'
+            f'<p:xfrm><a:off x="{int(CONTENT_LEFT)}" y="{int(CONTENT_TOP)}"/>'
+            f'<a:ext cx="{col_width * cols}" cy="{int(Pt(sum(heights)))}"/></p:xfrm>'
+            f'<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/table"><a:tbl>'
+            f'<a:tblPr firstRow="1" bandRow="1"><a:tableStyleId>{TABLE_STYLE_ID}</a:tableStyleId></a:tblPr>'
+            f'<a:tblGrid>{grid}</a:tblGrid>{"".join(rows)}</a:tbl></a:graphicData></a:graphic></p:graphicFrame>')
+
+def slide_xml(shapes, background=None):
+    bg = (f'<p:bg><p:bgPr><a:solidFill><a:srgbClr val="{background}"/></a:solidFill><a:effectLst/></p:bgPr></p:bg>'
+          if background else '')
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<p:sld {nsdecls("a", "r", "p")}><p:cSld>{bg}<p:spTree>'
+            '<p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr><p:grpSpPr/>'
+            f'{shapes}</p:spTree></p:cSld><p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sld>').encode('utf-8')
+
+def render_slide(spec):
+    """Slide part XML for one (kind, title, body) spec. Runs in the process pool workers."""
+    kind, title, body = spec
+    if kind == "COVER":
+        return slide_xml(title_xml(title, "ctrTitle"))
+    shapes = title_xml(flatten_to_string(title).replace('*', ''))
+    if kind == "TABLE":
+        return slide_xml(shapes + table_xml(body))
+    if kind == "REFERENCES":
+        return slide_xml(shapes + bullets_xml(body, bold_labels=False), CONTENT_BG_COLOR)
+    return slide_xml(shapes + bullets_xml(body))
+
+
+# === Package Assembly ===
+
+def render_slides(specs, workers=None):
+    """
+    Slide XML for every spec, in order, rendered inline. With
+    PPT_PARALLEL_SLIDES set, decks at least that large are spread over the
+    shared process pool (see pools) in chunks, unless this already runs in
+    a pool worker (e.g. agent_orchestrator.render_document): the pool never
+    waits on itself.
+    """
+    workers = max(1, workers or PPT_WORKERS)
+    if (workers == 1 or not PPT_PARALLEL_SLIDES or len(specs) < PPT_PARALLEL_SLIDES
+            or multiprocessing.parent_process() is not None):
+        return [render_slide(spec) for spec in specs]
+    chunksize = max(1, len(specs) // (workers * 4))
+    return list(get_process_pool().map(render_slide, specs, chunksize=chunksize))
+
+def write_package(slides, output_path):
+    """
+    Stitches rendered (layout name, slide XML) parts into a copy of the
+    template package in one pass. Masters, layouts, theme and media are copied
+    once; only the content types, presentation part and its relationships gain
+    slide entries, and all slides of a layout share one relationships part.
+    """
+    template = get_template_bytes()
+    layouts = get_template_layouts()
+    for layout in {layout for layout, _ in slides}:
+        if layout not in layouts:
+            raise ValueError(f"PPT template has no layout named {layout!r}")
+    slide_rels = {name: ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                         f'<Relationships xmlns="{PACKAGE_RELS_NS}"><Relationship Id="rId1" Type="{LAYOUT_RELTYPE}" '
+                         f'Target="../slideLayouts/{os.path.basename(part)}"/></Relationships>').encode('utf-8')
+                  for name, part in layouts.items()}
+
+    with zipfile.ZipFile(BytesIO(template)) as source:
+        types = etree.fromstring(source.read('[Content_Types].xml'))
+        rels = etree.fromstring(source.read('ppt/_rels/presentation.xml.rels'))
+        presentation = etree.fromstring(source.read('ppt/presentation.xml'))
+        slide_ids = presentation.find(qn('p:sldIdLst'))
+        if slide_ids is None:
+            slide_ids = etree.Element(qn('p:sldIdLst'))
+            presentation.find(qn('p:sldSz')).addprevious(slide_ids)
+        # Slides already in a designer template keep their numbers and ids
+        first = sum(1 for name in source.namelist() if re.fullmatch(r'ppt/slides/slide\d+\.xml', name)) + 1
+        next_rid = max(int(re.sub(r'\D', '', rel.get('Id')) or 0) for rel in rels) + 1
+        next_id = max([int(s.get('id')) for s in slide_ids] + [255]) + 1
+        for i in range(len(slides)):
+            number, rid = first + i, f"rId{next_rid + i}"
+            etree.SubElement(types, f'{{{CONTENT_TYPES_NS}}}Override',
+                             PartName=f"/ppt/slides/slide{number}.xml", ContentType=SLIDE_CONTENT_TYPE)
+            etree.SubElement(rels, f'{{{PACKAGE_RELS_NS}}}Relationship',
+                             Id=rid, Type=SLIDE_RELTYPE, Target=f"slides/slide{number}.xml")
+            etree.SubElement(slide_ids, qn('p:sldId'), {'id': str(next_id + i), qn('r:id'): rid})
+        changed = {'[Content_Types].xml': types, 'ppt/_rels/presentation.xml.rels': rels,
+                   'ppt/presentation.xml': presentation}
+
+        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as package:
+            for name in source.namelist():
+                if name in changed:
+                    package.writestr(name, etree.tostring(changed[name], xml_declaration=True,
+                                                          encoding='UTF-8', standalone=True))
+                else:
+                    package.writestr(name, source.read(name))
+            for i, (layout, xml) in enumerate(slides):
+                package.writestr(f"ppt/slides/slide{first + i}.xml", xml)
+                package.writestr(f"ppt/slides/_rels/slide{first + i}.xml.rels", slide_rels[layout])
 
 def generate_ppt(content, output_path="outputs/output.pptx", references=None, filename_title="Untitled Document"):
-    prs = Presentation()
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    add_cover_slide(prs, filename_title)
-    page_num = 2
     sections = extract_sections(content)
     if not sections:
-        print("❌ Error: No valid sections found.")
-        return
-    layout = prs.slide_layouts[6]
-    for kind, title, body in sections:
-        slide = prs.slides.add_slide(layout)
-        set_slide_background(slide)
-        add_title(slide, title)
-        if kind == "TEXT":
-            add_bullets(slide, body)
-        elif kind == "TABLE":
-            add_table(slide, body)
-        add_footer(slide, page_num)
-        page_num += 1
+        raise ValueError("No valid sections found.")
+    write_ppt_sections(sections, output_path, references, filename_title)
+
+def generate_ppt_stream(blocks, output_path="outputs/output.pptx", references=None, filename_title="Untitled Document"):
+    """Builds slides from markdown sections as they arrive from the LLM stream."""
+    sections = iter_slide_specs(iter_block_nodes(blocks))
+    if not write_ppt_sections(sections, output_path, references, filename_title):
+        raise ValueError("No valid sections found.")
+
+def generate_ppt_deck(slides, output_path="outputs/output.pptx", references=None, filename_title="Untitled Document"):
+    """Builds slides from a structured (JSON) deck; see iter_deck_specs."""
+    if not write_ppt_sections(iter_deck_specs(slides), output_path, references, filename_title):
+        raise ValueError("No valid sections found.")
+
+def write_ppt_sections(sections, output_path, references=None, filename_title="Untitled Document", workers=None):
+    """Returns the number of content slides written; nothing is saved if there are none."""
+    specs = [("COVER", format_cover_title(filename_title), None)]
+    specs.extend(sections)
+    count = len(specs) - 1
+    if not count:
+        return 0
     if references:
-        add_references_slide(prs, references, page_num)
-    prs.save(output_path)
+        references = [flatten_to_string(ref) for ref in references]
+        specs.extend(("REFERENCES", title, part) for title, part in number_parts("References", fit_bullets(references)))
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    slides = render_slides(specs, workers)
+    write_package([(SLIDE_LAYOUTS[spec[0]], xml) for spec, xml in zip(specs, slides)], output_path)
     print(f"✅ PPT saved to: {output_path}")
+    return count
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+
+from text_chunker import estimate_tokens
+
+# Output budgets per format; 0 leaves the completion length to the API.
+# A deck stitched from several chunk requests gets SLIDES_MAX_TOKENS per
+# request; one generated by a single request (short prompt, map-reduce
+# notes, CLI) is the whole deck and gets SLIDE_DECK_MAX_TOKENS
+DOCUMENT_MAX_TOKENS = int(os.getenv("DOCUMENT_MAX_TOKENS", "0"))
+SLIDES_MAX_TOKENS = int(os.getenv("SLIDES_MAX_TOKENS", "1200"))
+SLIDE_DECK_MAX_TOKENS = int(os.getenv("SLIDE_DECK_MAX_TOKENS", "4000"))
+SLIDE_MAX_BULLETS = int(os.getenv("SLIDE_MAX_BULLETS", "6"))
+SLIDE_BULLET_WORDS = int(os.getenv("SLIDE_BULLET_WORDS", "20"))
+
+
+# === Prompt Templates ===
+
+class PromptTemplate:
+    """
+    A versioned chat prompt: a static system prefix and a user message pattern
+    (str.format fields). The system text never contains request content, so
+    it is byte-identical across chunks and requests, which keeps it eligible
+    for provider-side prompt caching, and it is measured and hashed once here.
+    Bump `version` whenever the wording changes.
+    """
+    __slots__ = ('name', 'version', 'system', 'user', 'json', 'id', 'cache_id', 'system_tokens')
+
+    def __init__(self, name, version, system, user="{content}", json=False):
+        self.name = name
+        self.version = version
+        self.system = system
+        self.user = user
+        self.json = json   # the reply is a single JSON object (API JSON mode)
+        self.id = f"{name}/v{version}"
+        # Response cache entries follow the wording, even if a bump was forgotten
+        self.cache_id = f"{self.id}:{hashlib.sha256(system.encode('utf-8')).hexdigest()[:16]}"
+        self.system_tokens = estimate_tokens(system)
+
+    def format(self, **fields):
+        """The user message for one request."""
+        return self.user.format(**fields)
+
+    def messages(self, content):
+        """Chat messages for an already formatted user message; the content is sent exactly once."""
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": content},
+        ]
+
+    def __repr__(self):
+        return f"<PromptTemplate {self.id}>"
+
+
+# Long-form Word/PDF documents; also used when one pass feeds several formats
+DOCUMENT_PROMPT = PromptTemplate('document', 3, (
+    "You are an expert AI document generator.\n"
+    "Please format your output with proper markdown headings:\n"
+    "- Use '#' for main titles\n"
+    "- Use '##' for subheadings\n"
+    "- Use '###' for sub-subheadings\n"
+    "Avoid unnecessary special characters such as asterisks or hashes except for markdown headings.\n"
+    "Output a clean, readable document structure.\n"
+    "Generate a unique title for the document. Make sure to follow grammatical rules while doing so.\n"
+    "Explain the topics in detail. Everything should be well-explained.\n"
+    "Design tables as and when required.\n"
+    "Give well formatted equations as and when required."
+))
+
+# The number of slides is left to the material; only the slides themselves are bounded
+SLIDE_BUDGET = (f"Use as many slides as the material needs, each with at most {SLIDE_MAX_BULLETS} bullet points "
+                f"of at most {SLIDE_BULLET_WORDS} words.\n")
+
+# Slides as markdown, for streamed decks (JSON cannot be rendered before it is complete)
+SLIDES_PROMPT = PromptTemplate('slides', 2, (
+    "You are an expert presentation writer. Turn the request into presentation slides.\n"
+    "Start with one '# ' line holding a unique, grammatical deck title.\n"
+    "Start every slide with a '## ' line holding its title, followed by '- ' bullet points.\n"
+    + SLIDE_BUDGET +
+    "Use a markdown table only for tabular data.\n"
+    "Write no introduction, speaker notes or closing remarks: every line ends up on a slide."
+))
+
+SLIDE_DECK_EXAMPLE = {"title": "Deck title", "slides": [
+    {"title": "Slide title", "bullets": ["Point"], "table": {"header": ["Column"], "rows": [["Value"]]}}]}
+
+SLIDES_JSON_PROMPT = PromptTemplate('slides-json', 2, (
+    "You are an expert presentation writer. Turn the request into presentation slides.\n"
+    "Reply with a single JSON object and nothing else, shaped like:\n"
+    + json.dumps(SLIDE_DECK_EXAMPLE) + "\n"
+    "The deck title is unique and grammatical.\n"
+    + SLIDE_BUDGET +
+    "Include \"table\" only for tabular data and leave it out otherwise."
+), json=True)
+
+# Map-reduce passes (see agent_orchestrator.map_reduce_notes)
+MAP_PROMPT = PromptTemplate('map', 1, (
+    "You condense one excerpt of a larger source document into working notes for a writer.\n"
+    "Keep every fact, figure, name, date, definition and table row that is relevant to the task.\n"
+    "Drop repetition and filler. Write plain, compact bullet notes without a title or headings."
+), "Task: {task}\n\nExcerpt {index} of {total}:\n{excerpt}")
+
+REDUCE_PROMPT = PromptTemplate('reduce', 1, (
+    "You merge several sets of working notes taken from consecutive parts of one source document.\n"
+    "Combine them into a single set of notes in source order, removing duplicates while keeping\n"
+    "every distinct fact, figure, name, date and table row relevant to the task.\n"
+    "Write plain, compact bullet notes without a title or headings."
+), "Task: {task}\n\n{notes}")
+
+NOTES_REQUEST = "{task}\n\nBase the document on these notes from the source material:\n\n{notes}"
+
+
+# === Format Profiles ===
+
+class PromptProfile:
+    """
+    The template and completion budget one output format is generated with.
+    max_tokens applies to each of several chunk requests, single_max_tokens
+    (defaulting to max_tokens) to a document generated by one request.
+    """
+    __slots__ = ('output_format', 'template', 'max_tokens', 'single_max_tokens')
+
+    def __init__(self, output_format, template, max_tokens=0, single_max_tokens=0):
+        self.output_format = output_format
+        self.template = template
+        self.max_tokens = max_tokens or None
+        self.single_max_tokens = single_max_tokens or self.max_tokens
+
+    def budget(self, requests):
+        """Completion budget per request when the document takes `requests` requests."""
+        return self.single_max_tokens if requests == 1 else self.max_tokens
+
+    def __repr__(self):
+        return f"<PromptProfile {self.output_format}: {self.template.id}>"
+
+
+PROMPT_PROFILES = {
+    'docx': PromptProfile('docx', DOCUMENT_PROMPT, DOCUMENT_MAX_TOKENS),
+    'pdf': PromptProfile('pdf', DOCUMENT_PROMPT, DOCUMENT_MAX_TOKENS),
+    'pptx': PromptProfile('pptx', SLIDES_JSON_PROMPT, SLIDES_MAX_TOKENS, SLIDE_DECK_MAX_TOKENS),
+}
+STREAMED_SLIDES_PROFILE = PromptProfile('pptx', SLIDES_PROMPT, SLIDES_MAX_TOKENS, SLIDE_DECK_MAX_TOKENS)
+
+def prompt_profile(output_format, stream=False):
+    """
+    Profile for one output format, or for several (a list) rendered from the
+    same text, which needs the long-form document. Streamed decks are
+    generated as markdown, since their sections render while they arrive.
+    """
+    if not isinstance(output_format, str):
+        return PROMPT_PROFILES['docx']
+    if stream and output_format == 'pptx':
+        return STREAMED_SLIDES_PROFILE
+    return PROMPT_PROFILES[output_format]
@@ -0,0 +1,82 @@
+import email.utils
+import threading
+import time
+
+
+# === Token Bucket ===
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `per_minute` tokens/minute.
+    Callers reserve tokens up front (the balance may go negative) and are told
+    how long to wait, so concurrent callers queue up fairly instead of spinning.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity or per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+# === Request + Token Rate Limiter ===
+
+class RateLimiter:
+    """
+    Combines a requests-per-minute and a tokens-per-minute bucket and honours
+    server back-pressure: after a 429, `penalize` blocks every caller until the
+    Retry-After deadline has passed.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=0):
+        wait = self.requests.reserve(1)
+        if tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            time.sleep(wait)
+        # A 429 may have arrived while we were waiting
+        while True:
+            with self.lock:
+                remaining = self.blocked_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def debit(self, tokens):
+        """Charge tokens used after the fact (e.g. completion tokens) without waiting."""
+        if tokens > 0:
+            self.tokens.reserve(tokens)
+
+    def penalize(self, retry_after):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+
+def parse_retry_after(value, default=2.0):
+    """Parses a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, when.timestamp() - time.time())
@@ -1,25 +1,226 @@
-def chunk_text(text, max_tokens=700):
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import deque
+
+from artifact_store import atomic_write, chunk_cache
+
+# llama3's own vocabulary is not published with tiktoken; cl100k_base is a
+# close BPE relative, so counts for llama3 models are approximate (within a
+# few percent on English text), but far closer than 4 characters per token
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+# Holds <encoding>.tiktoken vocabulary files. A missing file is fetched once
+# from TOKENIZER_VOCAB_URL (TOKENIZER_DOWNLOAD=0 turns this off), or ahead of
+# time with `python text_chunker.py`
+TOKENIZER_VOCAB_DIR = os.getenv("TOKENIZER_VOCAB_DIR",
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'tiktoken'))
+TOKENIZER_DOWNLOAD = os.getenv("TOKENIZER_DOWNLOAD", "1") != "0"
+TOKENIZER_DOWNLOAD_TIMEOUT = float(os.getenv("TOKENIZER_DOWNLOAD_TIMEOUT", "10"))
+# Encodings that can be built from a local vocabulary: split pattern, special
+# tokens and the SHA-256 of the vocabulary file (as published by tiktoken)
+TOKENIZER_SPECS = {
+    "cl100k_base": (
+        r"""(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+""",
+        {"<|endoftext|>": 100257, "<|fim_prefix|>": 100258, "<|fim_middle|>": 100259,
+         "<|fim_suffix|>": 100260, "<|endofprompt|>": 100276},
+        "223921b76ee99bde995b7ff738513eef100fb51d18c93597a113bcffe865b2a7",
+    ),
+}
+TOKENIZER_VOCAB_URL = "https://openaipublic.blob.core.windows.net/encodings/{}.tiktoken"
+
+PARAGRAPH_BREAK = "\n\n"
+
+# Fallback order for pieces that are still too large: sentences, then words
+SPLITTERS = (
+    (re.compile(r'(?<=[.!?])\s+'), " "),
+    (re.compile(r'\s+'), " "),
+)
+
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """Rough token count for rate limiting (1 token ≈ 4 characters)."""
+    return len(text) // 4 + 1
+
+# === Tokenizer ===
+
+def fetch_vocabulary(encoding=TOKENIZER_ENCODING, vocab_dir=TOKENIZER_VOCAB_DIR,
+                     timeout=TOKENIZER_DOWNLOAD_TIMEOUT):
+    """
+    Downloads the vocabulary for `encoding` into `vocab_dir` and returns its
+    path. The file is only written once its SHA-256 matches the published one.
+    """
+    import requests
+    if encoding not in TOKENIZER_SPECS:
+        raise ValueError(f"no local spec for encoding {encoding!r}")
+    response = requests.get(TOKENIZER_VOCAB_URL.format(encoding), timeout=timeout)
+    response.raise_for_status()
+    if hashlib.sha256(response.content).hexdigest() != TOKENIZER_SPECS[encoding][2]:
+        raise ValueError(f"downloaded {encoding} vocabulary does not match the published hash")
+    path = os.path.join(vocab_dir, f"{encoding}.tiktoken")
+    atomic_write(path, response.content)
+    return path
+
+def load_tokenizer(encoding=TOKENIZER_ENCODING, vocab_dir=TOKENIZER_VOCAB_DIR):
+    """
+    Builds a tiktoken encoding from `vocab_dir`/<encoding>.tiktoken without
+    touching the network (tiktoken.get_encoding would download it with no
+    timeout). Raises when it cannot be loaded.
+    """
+    from tiktoken import Encoding
+    if encoding not in TOKENIZER_SPECS:
+        raise ValueError(f"no local spec for encoding {encoding!r}")
+    pattern, special_tokens, expected_hash = TOKENIZER_SPECS[encoding]
+    path = os.path.join(vocab_dir, f"{encoding}.tiktoken")
+    with open(path, 'rb') as f:
+        data = f.read()
+    if hashlib.sha256(data).hexdigest() != expected_hash:
+        raise ValueError(f"{path} does not match the published {encoding} vocabulary")
+    # One "<base64 token> <rank>" pair per line
+    ranks = {base64.b64decode(token): int(rank) for token, rank in (line.split() for line in data.splitlines() if line)}
+    return Encoding(encoding, pat_str=pattern, mergeable_ranks=ranks, special_tokens=special_tokens)
+
+def get_tokenizer():
     """
-    Splits a long string into smaller chunks based on character length.
-    This ensures it stays within token limits of most LLMs.
+    Returns a tiktoken encoding, or None when tiktoken (an optional dependency)
+    or its vocabulary is unavailable; counting then falls back to
+    estimate_tokens. A missing vocabulary is fetched once, taking at most
+    TOKENIZER_DOWNLOAD_TIMEOUT per network wait; every later call is answered
+    from the file.
     """
-    import textwrap
+    global _tokenizer, _tokenizer_loaded
+    with _tokenizer_lock:
+        if not _tokenizer_loaded:
+            _tokenizer_loaded = True
+            try:
+                try:
+                    _tokenizer = load_tokenizer()
+                except FileNotFoundError:
+                    if not TOKENIZER_DOWNLOAD:
+                        raise
+                    fetch_vocabulary()
+                    _tokenizer = load_tokenizer()
+            except Exception as e:
+                print(f"⚠️ Tokenizer unavailable ({type(e).__name__}: {e}); estimating 4 characters per token. "
+                      f"Vocabulary: {TOKENIZER_VOCAB_URL.format(TOKENIZER_ENCODING)}")
+        return _tokenizer
+
+def count_tokens(text):
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode_ordinary(text))
+
+# === Chunker ===
+
+def _iter_paragraphs(source):
+    # Paragraphs may straddle the pieces of a streamed source (e.g. PDF pages)
+    if isinstance(source, str):
+        source = (source,)
+    pending = []
+    for piece in source:
+        parts = piece.split(PARAGRAPH_BREAK)
+        if len(parts) == 1:
+            pending.append(piece)
+            continue
+        pending.append(parts[0])
+        yield "".join(pending)
+        yield from parts[1:-1]
+        pending = [parts[-1]]
+    yield "".join(pending)
 
-    # Approx: 1 token ≈ 4 characters (safe upper bound)
-    max_chars = max_tokens * 4
-    paragraphs = text.split('\n\n')
+def _pieces(text, max_tokens, sep, level=0):
+    """Yields (separator, text, tokens) pieces of at most max_tokens each."""
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        yield sep, text, tokens
+        return
+    if level < len(SPLITTERS):
+        pattern, joiner = SPLITTERS[level]
+        parts = [part for part in pattern.split(text) if part]
+        for i, part in enumerate(parts):
+            yield from _pieces(part, max_tokens, sep if i == 0 else joiner, level + 1)
+        return
+    # A single "word" longer than the budget: cut it by characters
+    step = max(1, len(text) * max_tokens // tokens)
+    for start in range(0, len(text), step):
+        piece = text[start:start + step]
+        yield (sep if start == 0 else ""), piece, count_tokens(piece)
+
+def _join(units):
+    return "".join(sep + text for sep, text, _ in units).strip()
+
+def iter_chunks(source, max_tokens=700, overlap=0):
+    """
+    Lazily splits text (a string, or an iterable of strings such as PDF pages)
+    into chunks of at most `max_tokens` tokens. Paragraph boundaries are
+    preferred; oversized paragraphs fall back to sentence and then word
+    boundaries. Each chunk after the first repeats up to `overlap` tokens from
+    the end of the previous one.
+    """
+    overlap = min(overlap, max_tokens // 2)
+    current = deque()
+    size = 0
+    fresh = False   # anything in `current` that has not been emitted yet?
 
-    chunks = []
-    current_chunk = ""
+    for paragraph in _iter_paragraphs(source):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        for unit in _pieces(paragraph, max_tokens, PARAGRAPH_BREAK):
+            tokens = unit[2]
+            if current and size + tokens + 1 > max_tokens:
+                if fresh:
+                    yield _join(current)
+                    fresh = False
+                # Keep the overlap tail, then make room for the new piece
+                kept, budget = deque(), overlap
+                while current and current[-1][2] <= budget:
+                    budget -= current[-1][2]
+                    kept.appendleft(current.pop())
+                current = kept
+                size = sum(u[2] + 1 for u in current)
+                while current and size + tokens + 1 > max_tokens:
+                    size -= current.popleft()[2] + 1
+            current.append(unit)
+            size += tokens + 1
+            fresh = True
 
-    for para in paragraphs:
-        if len(current_chunk) + len(para) < max_chars:
-            current_chunk += para + "\n\n"
-        else:
-            chunks.append(current_chunk.strip())
-            current_chunk = para + "\n\n"
+    if fresh:
+        yield _join(current)
 
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+def chunk_text(text, max_tokens=700, overlap=0):
+    """
+    Splits a long string into chunks that stay within the LLM token limit.
+    See iter_chunks for the streaming version.
+    """
+    return list(iter_chunks(text, max_tokens, overlap))
 
+def cached_chunk_text(cache_key, source, max_tokens=700, overlap=0):
+    """
+    chunk_text with the result stored in artifact_store.chunk_cache (swept
+    like uploads) under `cache_key` (JSON-able, e.g. an upload's content hash
+    and the prompt). `source` is a callable returning the text and is only
+    called on a miss.
+    """
+    counter = TOKENIZER_ENCODING if get_tokenizer() is not None else "estimate"
+    key = json.dumps([cache_key, max_tokens, overlap, counter])
+    name = hashlib.sha256(key.encode('utf-8')).hexdigest() + ".json"
+    path = chunk_cache.lookup(name)
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    chunks = chunk_text(source(), max_tokens, overlap)
+    chunk_cache.put(name, json.dumps(chunks), key, 'json')
     return chunks
+
+
+if __name__ == "__main__":
+    # Setup step for offline deployments: fetch the vocabulary ahead of time
+    print(f"Vocabulary saved to {fetch_vocabulary()}")
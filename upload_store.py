@@ -0,0 +1,80 @@
+import hashlib
+import os
+import tempfile
+
+from flask import Request, current_app
+
+UPLOAD_BLOCK_SIZE = 1 << 20  # 1 MiB
+
+
+# === Hashing Upload Stream ===
+
+class HashingFile:
+    """
+    Temporary file in the upload folder that hashes everything written to it.
+    Werkzeug's multipart parser writes upload parts here block by block, so
+    a file is never held in memory and is hashed in the same pass. The temp
+    file is removed on close unless store_upload moved it into place.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.part')
+        self.file = os.fdopen(fd, 'w+b')
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.stored = False
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def close(self):
+        self.file.close()
+        if not self.stored:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class UploadRequest(Request):
+    """Request class that streams file parts straight into the upload folder."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingFile(current_app.config['UPLOAD_FOLDER'])
+
+
+# === Content-Addressed Store ===
+
+def store_upload(file_storage, store, ext):
+    """
+    Moves an uploaded file into `store` (an ArtifactStore) as <sha256><ext>
+    and returns (sha256, path). Identical content is stored once: a re-upload
+    of the same bytes keeps the existing file, so caches keyed on the hash
+    still apply, and refreshes its place in the eviction order.
+    """
+    stream = file_storage.stream
+    if not isinstance(stream, HashingFile):
+        # Parts not parsed by UploadRequest: copy them through a HashingFile
+        hashing = HashingFile(store.directory)
+        for block in iter(lambda: stream.read(UPLOAD_BLOCK_SIZE), b''):
+            hashing.write(block)
+        stream = hashing
+    digest = stream.sha256.hexdigest()
+    name = digest + ext.lower()
+    path = store.file_path(name)
+    if os.path.exists(path) and store.get(name):
+        stream.close()
+        store.touch(name)
+        return digest, path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    stream.file.close()
+    os.replace(stream.path, path)
+    stream.stored = True
+    store.record(path, file_storage.filename or name, ext.lower().lstrip('.'), allow_empty=True)
+    return digest, path